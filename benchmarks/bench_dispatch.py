@@ -0,0 +1,69 @@
+"""Route matching latency of werkzeug's url map against the trie Dispatcher.
+
+Rules have the shape of the generated api: /<url_name>/<level_0_id>/<rel>
+... with a collection and an item rule per path.
+
+Run with ``python -m benchmarks.bench_dispatch``.
+"""
+import random
+from timeit import repeat
+
+from rest.dispatch import Dispatcher
+from werkzeug.routing import Map, Rule
+
+
+def generated_rules(count, fanout=10):
+    rules, paths = [], [()]
+    while len(rules) < count:
+        path = paths.pop(0)
+        for i in range(fanout):
+            child = path + ('r{}'.format(i),)
+            paths.append(child)
+            collection = ''.join(
+                '/{}/<level_{}_id>'.format(name, level)
+                for level, name in enumerate(child[:-1])
+            ) + '/' + child[-1]
+            item = '{}/<level_{}_id>'.format(collection, len(child) - 1)
+            rules.extend((collection, item))
+    return rules[:count]
+
+
+def concrete_url(rule):
+    return '/'.join(
+        'x1' if segment.startswith('<') else segment
+        for segment in rule.split('/')
+    )
+
+
+def main(sizes=(100, 1000, 10000), samples=200, number=20):
+    rnd = random.Random(0)
+    for size in sizes:
+        rules = generated_rules(size)
+        urls = [
+            concrete_url(rnd.choice(rules)) for _ in range(samples)
+        ]
+        adapter = Map(
+            [Rule(r, endpoint=r, methods=['GET']) for r in rules]
+        ).bind('localhost')
+        dispatcher = Dispatcher()
+        for r in rules:
+            dispatcher.add(r, 'GET', r)
+
+        def werkzeug_match():
+            for url in urls:
+                adapter.match(url, method='GET')
+
+        def dispatcher_match():
+            for url in urls:
+                dispatcher.match(url)
+
+        for name, f in (('werkzeug', werkzeug_match),
+                        ('dispatcher', dispatcher_match)):
+            best = min(repeat(f, number=number, repeat=5))
+            print('{:>6} rules {:<12}{:>8.2f} us/match'.format(
+                size, name, best / number / samples * 1e6
+            ))
+
+
+if __name__ == '__main__':
+    main()
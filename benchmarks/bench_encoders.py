@@ -0,0 +1,62 @@
+"""Encoding serialized collections of the fixture models to response bodies.
+
+Compares Flask's jsonify, in debug mode (indented) and not, with the
+encoders register_all_apis can be given. Every variant produces the
+response object, so the numbers include building it.
+
+Run with ``python -m benchmarks.bench_encoders``.
+"""
+from functools import partial
+from timeit import repeat
+
+from flask import Flask, jsonify
+from rest.encoders import encoders, json_response, use_encoder
+from rest.handlers import create_schema, serialize_collection
+from tests.fixtures import Level1, Level3, Root, hierarchy_full_data, session
+
+
+def collections(db_session):
+    for model in (Root, Level1, Level3):
+        schema = create_schema(model)()
+        yield model.__name__, serialize_collection(
+            schema, db_session.query(model).all()
+        )
+
+
+def jsonify_body(app, data):
+    return jsonify(data).get_data()
+
+
+def encoder_body(app, encoder, data):
+    use_encoder(app, encoder)
+    return json_response(data).get_data()
+
+
+def main(number=50):
+    db_session = session()
+    hierarchy_full_data(db_session, count=6)
+    db_session.commit()
+    app = Flask(__name__)
+    variants = [
+        ('jsonify debug', True, jsonify_body),
+        ('jsonify', False, jsonify_body),
+    ] + [
+        (name, False, partial(encoder_body, encoder=encoder))
+        for name, encoder in sorted(encoders.items())
+    ]
+    for model_name, data in collections(db_session):
+        items = len(data['items'])
+        for name, debug, body in variants:
+            app.debug = debug
+            with app.app_context():
+                size = len(body(app, data=data))
+                best = min(repeat(
+                    partial(body, app, data=data), number=number, repeat=5
+                ))
+            print('{:<8}{:>6} items {:<14}{:>9} bytes {:>8.2f} us/item'
+                  .format(model_name, items, name, size,
+                          best / number / items * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Import time and graph cost of networkx against the built-in ModelGraph.
+
+rest.hierarchy_traverser used to import networkx on top of its own imports
+(mostly sqlalchemy), so its import time was higher by the networkx line.
+
+Run with ``python -m benchmarks.bench_graph``.
+"""
+import subprocess
+import sys
+from time import time
+
+from benchmarks.bench_paths import synthetic_graph
+from rest.hierarchy_traverser import all_paths, to_networkx
+
+IMPORT_TIMER = (
+    'from time import time; start = time(); import {}; print(time() - start)'
+)
+
+
+def import_time(module, repeat=5):
+    return min(
+        float(subprocess.check_output(
+            [sys.executable, '-c', IMPORT_TIMER.format(module)]
+        ))
+        for _ in range(repeat)
+    )
+
+
+def best_of(f, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time()
+        f()
+        times.append(time() - start)
+    return min(times)
+
+
+def copy_graph(graph):
+    return graph.copy()
+
+
+def count_paths(graph):
+    return sum(1 for _ in all_paths(graph, 0, max_depth=4))
+
+
+def main(size=500):
+    for module in ('sqlalchemy', 'rest.hierarchy_traverser', 'networkx'):
+        print('import {:<26}{:>8.1f} ms'.format(
+            module, import_time(module) * 1e3
+        ))
+    graph = synthetic_graph(size)
+    graphs = (('ModelGraph', graph), ('networkx', to_networkx(graph)))
+    for name, g in graphs:
+        for action, f in (('copy', copy_graph), ('paths', count_paths)):
+            print('{:<12}{:<8}{:>8.1f} ms'.format(
+                name, action, best_of(lambda: f(g)) * 1e3
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Per-request framework overhead of the compiled handler views.
+
+Measures the views get_handler and friends build, with the database
+stubbed: the handler itself returns immediately.
+
+Run with ``python -m benchmarks.bench_handlers``.
+"""
+from functools import partial
+from timeit import repeat
+
+from flask import Flask
+from rest.handlers import (
+    data_handler,
+    get_handler,
+    get_item_handler,
+    key_names,
+)
+
+SPECS = {'by_name': lambda name, query: query}
+KWARGS = {'level_{}_id'.format(i): str(i) for i in range(4)}
+
+
+def stub_handler(*keys, **kwargs):
+    return '', 200
+
+
+def main(number=20000):
+    keys = key_names(4)
+    cases = (
+        (
+            'collection GET',
+            '/?page=2&size=10&fields=name,id',
+            None,
+            get_handler(stub_handler, SPECS, keys),
+        ),
+        (
+            'item GET',
+            '/?fields=name',
+            None,
+            get_item_handler(stub_handler, keys),
+        ),
+        (
+            'POST',
+            '/',
+            '{"name": "a"}',
+            data_handler(stub_handler, keys),
+        ),
+    )
+    app = Flask(__name__)
+    for name, url, data, view in cases:
+        with app.test_request_context(url, data=data, method='POST',
+                                      content_type='application/json'):
+            best = min(repeat(
+                partial(view, **KWARGS), number=number, repeat=5
+            ))
+            print('{:<16}{:>8.2f} us/request'.format(
+                name, best / number * 1e6
+            ))
+
+
+if __name__ == '__main__':
+    main()
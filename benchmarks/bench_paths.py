@@ -0,0 +1,54 @@
+"""Path enumeration on synthetic model graphs of 50 to 500 models.
+
+Every model has a one-to-many relationship to a few models created after it
+and a backref to its parent, so the graph is densely cyclic the way
+bidirectional relationships make it.
+
+Run with ``python -m benchmarks.bench_paths``.
+"""
+import random
+from time import time
+from warnings import catch_warnings, simplefilter
+
+from rest.hierarchy_traverser import ModelGraph, all_paths
+from sqlalchemy.orm.base import MANYTOONE, ONETOMANY
+
+
+def synthetic_graph(size, fanout=3, seed=0):
+    rnd = random.Random(seed)
+    graph = ModelGraph()
+    for child in range(1, size):
+        parents = rnd.sample(range(child), min(child, rnd.randint(1, fanout)))
+        for parent in parents:
+            graph.add_edge(parent, child, rel_attr='c{}'.format(child),
+                           rel_type=ONETOMANY)
+            graph.add_edge(child, parent, rel_attr='p{}'.format(parent),
+                           rel_type=MANYTOONE)
+    return graph
+
+
+def one_to_many(parent, child, data):
+    return data['rel_type'] == ONETOMANY
+
+
+def main(sizes=(50, 100, 200, 500)):
+    limits = (
+        ('max_depth=3', {'max_depth': 3}),
+        ('one_to_many', {'edge_filter': one_to_many, 'max_depth': 6}),
+        ('max_paths=1e5', {'max_paths': 100000}),
+    )
+    for size in sizes:
+        graph = synthetic_graph(size)
+        for name, kwargs in limits:
+            start = time()
+            with catch_warnings():
+                simplefilter('ignore')
+                count = sum(1 for _ in all_paths(graph, 0, **kwargs))
+            elapsed = time() - start
+            print('{:>4} models {:<14}{:>8} paths {:>8.1f} ms {:>6.2f} us/path'
+                  .format(size, name, count, elapsed * 1e3,
+                          elapsed / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
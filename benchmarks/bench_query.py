@@ -0,0 +1,59 @@
+"""Per-request cost of building the query for a 4-level-deep path.
+
+Run with ``python -m benchmarks.bench_query``.
+"""
+from functools import partial
+from timeit import repeat
+
+from rest.query import prepared_query, query
+from tests.fixtures import (
+    Level1,
+    Level2,
+    Level3,
+    Root,
+    hierarchy_full_data,
+    session,
+)
+
+KEYS = (
+    'root_0_level1_0_level2_0_level3_0',
+    'root_0_level1_0_level2_0',
+    'root_0_level1_0',
+    'root_0',
+)
+JOIN_ATTRS = (Level2, Level1, Root)
+ATTRS_TO_FILTER = (Level3.name, Level2.name, Level1.name, Root.name)
+
+
+def build_and_execute(db_session, make_query):
+    make_query(session=db_session, keys=KEYS).all()
+
+
+def main(number=2000):
+    db_session = session()
+    hierarchy_full_data(db_session)
+    db_session.commit()
+    candidates = (
+        ('query', partial(
+            query,
+            model_to_query=Level3,
+            join_attrs=JOIN_ATTRS,
+            attrs_to_filter=ATTRS_TO_FILTER,
+        )),
+        ('prepared_query', prepared_query(
+            model_to_query=Level3,
+            join_attrs=JOIN_ATTRS,
+            attrs_to_filter=ATTRS_TO_FILTER,
+        )),
+    )
+    for name, make_query in candidates:
+        best = min(repeat(
+            partial(build_and_execute, db_session, make_query),
+            number=number,
+            repeat=5,
+        ))
+        print('{:<16}{:>10.1f} us/request'.format(name, best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Marshmallow schema dump vs compiled row serializer for a collection.
+
+Run with ``python -m benchmarks.bench_serializers``.
+"""
+from functools import partial
+from timeit import repeat
+
+from rest.handlers import create_schema, serialize_collection
+from rest.row_serializer import row_serializer
+from tests.fixtures import Level3, hierarchy_full_data, session
+
+
+def marshmallow_path(db_session, schema):
+    serialize_collection(schema, db_session.query(Level3).all())
+
+
+def compiled_path(db_session, serializer):
+    serializer(db_session.query(*serializer.columns).all())
+
+
+def main(number=200):
+    db_session = session()
+    hierarchy_full_data(db_session, count=6)
+    db_session.commit()
+    rows = db_session.query(Level3).count()
+    schema = create_schema(Level3)()
+    candidates = (
+        ('marshmallow', partial(marshmallow_path, db_session, schema)),
+        ('row_serializer', partial(
+            compiled_path,
+            db_session,
+            row_serializer(Level3, schema, many=True),
+        )),
+    )
+    for name, f in candidates:
+        best = min(repeat(f, number=number, repeat=5))
+        print('{:<16}{:>10.1f} us/row'.format(
+            name, best / number / rows * 1e6
+        ))
+
+
+if __name__ == '__main__':
+    main()
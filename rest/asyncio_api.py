@@ -0,0 +1,65 @@
+from contextvars import ContextVar
+from functools import partial
+
+from flask import make_response
+from rest.endpoints import create_api
+from rest.helpers import compose, identity
+from six import iteritems
+
+
+current_session = ContextVar('current_session')
+
+
+# Stands in for the session the handlers are built with. Every request gets
+# its own AsyncSession and the handler runs inside AsyncSession.run_sync,
+# where this proxy resolves to the sync session of the current request.
+class SessionProxy(object):
+    def __getattr__(self, name):
+        try:
+            session = current_session.get()
+        except LookupError:
+            raise RuntimeError('No session outside of a request')
+        return getattr(session, name)
+
+
+def run_with_session(handler, session, *args, **kwargs):
+    token = current_session.set(session)
+    try:
+        return make_response(handler(*args, **kwargs))
+    finally:
+        current_session.reset(token)
+
+
+def async_handler(session_factory, handler):
+    async def handle(*args, **kwargs):
+        async with session_factory() as session:
+            return await session.run_sync(
+                partial(run_with_session, handler), *args, **kwargs
+            )
+    return handle
+
+
+# Streamed responses are produced after the handler returns, when the
+# request's session is already closed.
+def without_streaming(config):
+    for conf in config.values():
+        conf['stream_chunk_size'] = None
+    return config
+
+
+def create_async_api(root_model, session_factory,
+                     config_decorator=identity, **kwargs):
+    apis, schemas = create_api(
+        root_model,
+        SessionProxy(),
+        config_decorator=compose(without_streaming, config_decorator),
+        **kwargs
+    )
+    for endpoints in apis.values():
+        for eps in endpoints:
+            for methods in eps.values():
+                for method, (rule, handler) in list(iteritems(methods)):
+                    methods[method] = (
+                        rule, async_handler(session_factory, handler)
+                    )
+    return apis, schemas
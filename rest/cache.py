@@ -0,0 +1,105 @@
+import pickle
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from uuid import uuid4
+
+from six.moves import zip
+from six.moves.urllib.parse import urlencode
+
+
+class CacheBackend(object):
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError()
+
+    def get_many(self, keys):
+        return [self.get(k) for k in keys]
+
+
+class LocalCache(CacheBackend):
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._items.pop(key)
+            except KeyError:
+                return None
+            if expires is not None and expires <= time():
+                return None
+            self._items[key] = (expires, value)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time() + ttl if ttl else None
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (expires, value)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+# Behaves like a cache shared between processes (memcached, redis): values
+# are copied in and out as bytes, so nothing is shared by reference.
+class PickledCache(CacheBackend):
+    def __init__(self, backend=None):
+        self.backend = backend or LocalCache()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, pickle.dumps(value), ttl)
+
+
+def generation_key(model):
+    return 'generation:{}.{}'.format(model.__module__, model.__name__)
+
+
+def new_generation():
+    return uuid4().hex
+
+
+# Every cached response is keyed by the current generation of the models it
+# depends on. Invalidating a model replaces its generation, so entries for
+# the old one are never looked up again and simply expire. A generation
+# evicted from the backend is replaced too, which can't resurrect old keys.
+class ResponseCache(object):
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or LocalCache()
+        self.ttl = ttl
+
+    def generations(self, models):
+        keys = [generation_key(m) for m in models]
+        generations = list(self.backend.get_many(keys))
+        for i, (key, generation) in enumerate(zip(keys, generations)):
+            if generation is None:
+                generations[i] = new_generation()
+                self.backend.set(key, generations[i], 0)
+        return generations
+
+    def key(self, models, path, args):
+        return '{}?{}|{}'.format(
+            path,
+            urlencode(sorted(args)),
+            '.'.join(self.generations(models)),
+        )
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, models):
+        for m in models:
+            self.backend.set(generation_key(m), new_generation(), 0)
@@ -0,0 +1,106 @@
+import zlib
+
+from gzip import GzipFile
+from io import BytesIO
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+DEFLATE_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+# mtime=0 keeps the output (and anything hashed from it) stable.
+def gzip_compress(data, level=GZIP_LEVEL):
+    out = BytesIO()
+    with GzipFile(fileobj=out, mode='wb', compresslevel=level, mtime=0) as f:
+        f.write(data)
+    return out.getvalue()
+
+
+# HTTP's deflate is the zlib format, not raw deflate.
+def deflate_compress(data, level=DEFLATE_LEVEL):
+    return zlib.compress(data, level)
+
+
+def brotli_compress(data, level=BROTLI_QUALITY):
+    return brotli.compress(data, quality=level)
+
+
+compressors = {'gzip': gzip_compress, 'deflate': deflate_compress}
+if brotli is not None:
+    compressors['br'] = brotli_compress
+
+
+# Incremental counterparts of compressors, for bodies that are streamed.
+# They have compress and flush, like zlib's compression objects.
+def gzip_compressobj(level=GZIP_LEVEL):
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def deflate_compressobj(level=DEFLATE_LEVEL):
+    return zlib.compressobj(level)
+
+
+class BrotliCompressobj(object):
+    def __init__(self, level=BROTLI_QUALITY):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+compressobjs = {'gzip': gzip_compressobj, 'deflate': deflate_compressobj}
+if brotli is not None:
+    compressobjs['br'] = BrotliCompressobj
+
+# Preferred order when the client accepts several encodings equally.
+ENCODINGS = ('br', 'gzip', 'deflate', 'identity')
+
+
+def compressed_variants(data, levels=None):
+    variants = {'identity': data}
+    for name in compressors:
+        compressed = compress(name, data, levels)
+        if len(compressed) < len(data):
+            variants[name] = compressed
+    return variants
+
+
+# identity is always a candidate, a client may prefer it to what's
+# available compressed.
+def best_encoding(available, accept_encodings):
+    return accept_encodings.best_match(
+        [e for e in ENCODINGS if e in available or e == 'identity'],
+        'identity',
+    )
+
+
+def compress(encoding, data, levels=None):
+    if levels and encoding in levels:
+        return compressors[encoding](data, levels[encoding])
+    return compressors[encoding](data)
+
+
+def compress_stream(encoding, chunks, levels=None):
+    compressor = (compressobjs[encoding](levels[encoding])
+                  if levels and encoding in levels
+                  else compressobjs[encoding]())
+    try:
+        for chunk in chunks:
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
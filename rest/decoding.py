@@ -0,0 +1,110 @@
+import json
+
+from flask import request
+from six import iteritems, string_types
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from jsonschema import Draft4Validator
+except ImportError:
+    Draft4Validator = None
+
+INVALID_JSON_MESSAGE = 'Request body is not valid JSON'
+INVALID_BODY_MESSAGE = 'Request body does not match the schema'
+BODY_TOO_LARGE_MESSAGE = 'Request body is larger than {} bytes'
+UNSUPPORTED_MEDIA_TYPE_MESSAGE = 'Request body has to be application/json'
+
+
+class BodyError(ValueError):
+    def __init__(self, message, status, errors=None):
+        self.message = message
+        self.status = status
+        self.errors = errors
+
+    def __str__(self):
+        return str(self.message)
+
+
+# Both parse bytes as they are, without decoding them to str first.
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+# The declared length is checked before anything is read, bodies sent
+# without one are read up to max_size and rejected if there's more. Non-empty
+# bodies have to be declared as JSON, however they were sent.
+def read_body(max_size=None):
+    length = request.content_length
+    if max_size is not None and length is not None and length > max_size:
+        raise BodyError(BODY_TOO_LARGE_MESSAGE.format(max_size), 413)
+    if length and not request.is_json:
+        raise BodyError(UNSUPPORTED_MEDIA_TYPE_MESSAGE, 415)
+    if max_size is None or length is not None:
+        body = request.get_data()
+    else:
+        body = request.stream.read(max_size + 1)
+        if len(body) > max_size:
+            raise BodyError(BODY_TOO_LARGE_MESSAGE.format(max_size), 413)
+    if body and not request.is_json:
+        raise BodyError(UNSUPPORTED_MEDIA_TYPE_MESSAGE, 415)
+    return body
+
+
+def decode_body(body, validator=None):
+    try:
+        data = loads(body)
+    except ValueError:
+        raise BodyError(INVALID_JSON_MESSAGE, 400)
+    if validator is not None:
+        errors = validator(data)
+        if errors:
+            raise BodyError(INVALID_BODY_MESSAGE, 400, errors)
+    return data
+
+
+# Builds a check of request bodies against the json schema of a model, so
+# malformed items are rejected before marshmallow loads them. Lists are
+# checked item by item, like bulk handlers add them. Returns None when
+# jsonschema isn't installed.
+def body_validator(schema, partial=False):
+    if Draft4Validator is None or schema is None:
+        return None
+    validator = Draft4Validator(body_schema(schema, partial))
+
+    def validate(data):
+        errors = {}
+        items = enumerate(data) if isinstance(data, list) else ((None, data),)
+        for index, item in items:
+            for error in validator.iter_errors(item):
+                path = [str(p) for p in error.absolute_path]
+                if index is not None:
+                    path.insert(0, str(index))
+                errors.setdefault('.'.join(path) or '_schema', []).append(
+                    error.message
+                )
+        return errors
+    return validate
+
+
+# Fields that aren't required may be sent as null, partial bodies don't
+# have required fields at all.
+def body_schema(schema, partial=False):
+    required = () if partial else schema.get('required', ())
+    properties = {}
+    for name, prop in iteritems(schema.get('properties', {})):
+        nullable = (name not in required and
+                    isinstance(prop.get('type'), string_types))
+        properties[name] = (
+            dict(prop, type=[prop['type'], 'null']) if nullable else prop
+        )
+    body = dict(schema, properties=properties)
+    body.pop('links', None)
+    if partial:
+        body.pop('required', None)
+    return body
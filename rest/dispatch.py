@@ -0,0 +1,140 @@
+import re
+
+from flask import abort, current_app, request
+from rest.helpers import identity
+from werkzeug.exceptions import MethodNotAllowed
+
+VARIABLE = re.compile(r'^<(?:(?P<converter>\w+):)?(?P<name>\w+)>$')
+
+
+def string(segment):
+    if not segment:
+        raise ValueError(segment)
+    return segment
+
+
+def int_(segment):
+    if not segment.isdigit():
+        raise ValueError(segment)
+    return int(segment)
+
+
+converters = {
+    None: string,
+    'string': string,
+    'int': int_,
+}
+
+
+class Node(object):
+    __slots__ = ('literals', 'variables', 'handlers')
+
+    def __init__(self):
+        self.literals = {}
+        self.variables = []
+        self.handlers = {}
+
+
+def parse_rule(rule):
+    for segment in rule.strip('/').split('/'):
+        variable = VARIABLE.match(segment)
+        if variable is None:
+            yield segment, None, None
+        else:
+            converter = variable.group('converter')
+            if converter not in converters:
+                raise ValueError(
+                    'Unsupported converter {} in {}'.format(converter, rule)
+                )
+            yield None, variable.group('name'), converters[converter]
+
+
+# Matches the url rules generated for the api segment by segment against a
+# trie, so matching cost depends on the depth of the url instead of the
+# number of rules. Literal segments win over variables, like in werkzeug.
+class Dispatcher(object):
+    def __init__(self):
+        self.root = Node()
+
+    def add(self, rule, method, view_func):
+        node = self.root
+        for literal, name, converter in parse_rule(rule):
+            if literal is not None:
+                node = node.literals.setdefault(literal, Node())
+                continue
+            child = next((c for n, conv, c in node.variables
+                          if n == name and conv is converter), None)
+            if child is None:
+                child = Node()
+                node.variables.append((name, converter, child))
+            node = child
+        if method in node.handlers:
+            raise ValueError(
+                '{} {} is already registered'.format(method, rule)
+            )
+        node.handlers[method] = view_func
+
+    def match(self, path):
+        kwargs = {}
+        segments = path.lstrip('/').split('/')
+        node = match_segments(self.root, segments, 0, kwargs)
+        return (node.handlers, kwargs) if node is not None else (None, None)
+
+    def __call__(self, path=''):
+        handlers, kwargs = self.match(path)
+        if handlers is None:
+            abort(404)
+        method = request.method
+        if method == 'HEAD' and 'HEAD' not in handlers:
+            method = 'GET'
+        if method not in handlers:
+            raise MethodNotAllowed(valid_methods=sorted(handlers))
+        ensure_sync = getattr(current_app, 'ensure_sync', identity)
+        return ensure_sync(handlers[method])(**kwargs)
+
+
+def match_segments(node, segments, i, kwargs):
+    if i == len(segments):
+        return node if node.handlers else None
+    segment = segments[i]
+    child = node.literals.get(segment)
+    if child is not None:
+        found = match_segments(child, segments, i + 1, kwargs)
+        if found is not None:
+            return found
+    for name, converter, child in node.variables:
+        try:
+            kwargs[name] = converter(segment)
+        except ValueError:
+            continue
+        found = match_segments(child, segments, i + 1, kwargs)
+        if found is not None:
+            return found
+        del kwargs[name]
+    return None
+
+
+def dispatcher_for(endpoint_params):
+    dispatcher = Dispatcher()
+    for ep in endpoint_params:
+        for method in ep.methods:
+            dispatcher.add(ep.rule, method, ep.view_func)
+    return dispatcher
+
+
+def methods_of(dispatcher):
+    methods, nodes = set(), [dispatcher.root]
+    while nodes:
+        node = nodes.pop()
+        methods.update(node.handlers)
+        nodes.extend(node.literals.values())
+        nodes.extend(c for n, conv, c in node.variables)
+    return sorted(methods)
+
+
+def register_dispatcher(app, endpoint_params, endpoint='dispatch'):
+    dispatcher = dispatcher_for(endpoint_params)
+    methods = methods_of(dispatcher)
+    app.add_url_rule('/<path:path>', endpoint=endpoint,
+                     view_func=dispatcher, methods=methods)
+    return dispatcher
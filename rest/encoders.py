@@ -0,0 +1,79 @@
+import json
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+EXTENSION_KEY = 'rest.encoder'
+
+
+# Values marshmallow fields and the row serializer can leave in their
+# output. Decimals are strings so they keep their precision.
+def default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+# Encoders take the serialized data and return the body as bytes.
+def stdlib_encoder(data):
+    return json.dumps(
+        data, default=default, separators=(',', ':'), ensure_ascii=False
+    ).encode('utf-8')
+
+
+# orjson writes datetimes itself, in a format that differs from isoformat
+# for naive values, passing them through keeps both encoders consistent.
+# Validation errors of bulk requests are keyed by item index.
+def orjson_encoder(data):
+    return orjson.dumps(data, default=default, option=(
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    ))
+
+
+def ujson_encoder(data):
+    return ujson.dumps(
+        data, default=default, ensure_ascii=False
+    ).encode('utf-8')
+
+
+encoders = {'json': stdlib_encoder}
+if orjson is not None:
+    encoders['orjson'] = orjson_encoder
+if ujson is not None:
+    encoders['ujson'] = ujson_encoder
+
+
+def fastest_encoder():
+    return next(
+        encoders[name] for name in ('orjson', 'ujson', 'json')
+        if name in encoders
+    )
+
+
+def use_encoder(app, encoder):
+    app.extensions[EXTENSION_KEY] = encoder
+
+
+def current_encoder():
+    return current_app.extensions.get(EXTENSION_KEY, stdlib_encoder)
+
+
+def json_response(data, status=200):
+    return current_app.response_class(
+        current_encoder()(data), status=status, mimetype='application/json'
+    )
@@ -5,35 +5,73 @@ from itertools import chain
 from six.moves import zip, zip_longest
 
 from rest.handlers import (
+    COMPRESS_MIN_SIZE,
+    cached_handler,
+    collection_data_handler,
+    column_field,
+    compressing_handler,
+    conditional_handler,
     create_handler,
     create_schema,
     data_handler,
+    delete_collection,
     delete_item,
     delete_many_to_many,
     deserialize_item,
     get_collection,
     get_handler,
     get_item,
+    get_item_handler,
+    invalidating_handler,
+    key_names,
+    model_schema_handler,
+    link_many_to_many,
     patch_item,
     post_item,
     post_item_many_to_many,
+    precomputed_handler,
+    precomputed_json,
     root_adder,
+    root_bulk_adder,
     non_root_adder,
-    schemas_handler,
+    non_root_bulk_adder,
+    patch_collection,
+    request_scoped_session,
     serialize_collection,
     serialize_item,
+    session_handler,
+    unlink_many_to_many,
+    update_item,
+    validate_item,
 )
-from rest.helpers import identity, list_dict
+from rest.decoding import body_validator
+from rest.dispatch import register_dispatcher
+from rest.encoders import use_encoder
+from rest.graph_cache import (
+    graph_fingerprint,
+    load_graph_cache,
+    save_graph_cache,
+    url_rules_key,
+)
+from rest.helpers import identity, list_dict, once
 from rest.hierarchy_traverser import all_paths, create_graph
-from rest.introspect import pk_attr_name
-from rest.query import query
+from rest.introspect import (
+    dumped_relationships,
+    has_update_hooks,
+    pk_attr_name,
+)
+from rest.query import counter_for, loader_options, prepared_query
+from rest.row_serializer import row_serializer
 from rest.schema import to_jsonschema
+from sqlalchemy import inspect
+from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm.base import MANYTOMANY
 from six import iteritems
 from more_functools import dmap
 
 
 EndpointParams = namedtuple('EndpointParams', 'rule endpoint view_func methods')
+SCHEMAS_MAX_AGE = 24 * 60 * 60
 
 
 # This class could be used instead of dict to simplify testing a little
@@ -105,7 +143,7 @@ def make_link(graph, model, links, relation):
 
 
 def is_many_to_many(graph, model, parent):
-    return ((model, parent) in graph.edges() and
+    return (graph.has_edge(model, parent) and
             graph[model][parent]['rel_type'] == MANYTOMANY)
 
 
@@ -117,40 +155,107 @@ def join_on(graph, child, parent):
         return parent
 
 
-def apis_for_path(path, config, db_session, graph):
-    col_rule, item_rule = url_rules_for_path(path[1:], config, graph)
+def model_attr(model, attr_name):
+    return getattr(model, attr_name) if attr_name is not None else None
+
+
+def apis_for_path(path, config, db_session, graph, cache=None,
+                  url_rules=None):
+    col_rule, item_rule = url_rules or url_rules_for_path(
+        path[1:], config, graph
+    )
     model = path[-1]
     parent = path[-2]
     model_config = config[model]
     endpoints = defaultdict(dict)
 
     ps = [m for m in reversed(path) if m is not None]
+    item_keys = key_names(len(ps))
+    collection_keys = item_keys[1:]
 
     attrs_to_filter = tuple((getattr(m, config[m]['exposed_attr'])
                              for m in ps))
 
     join_attrs = [join_on(graph, ch, p) for ch, p in zip(ps, ps[1:])]
-    collection_query = partial(
-        query,
+    cursor_attrs = tuple(
+        getattr(model, a)
+        for a in (model_config.get('sort_attr'), model_config['exposed_attr'])
+        if a is not None
+    )
+    collection_query = prepared_query(
         model_to_query=model,
         join_attrs=join_attrs,
         attrs_to_filter=attrs_to_filter[1:]
     )
-    item_query = partial(
-        query,
+    item_query = prepared_query(
         model_to_query=model,
         join_attrs=join_attrs,
         attrs_to_filter=attrs_to_filter,
     )
+    max_body_size = model_config.get('max_body_size')
+    body_schema = (to_jsonschema(model_config['schema'])
+                   if model_config.get('validate_body', True) else None)
+    item_body_validator = body_validator(body_schema)
+    loaders = model_config.get('loader_options', {})
+    default_loaders = loader_options(
+        model,
+        dumped_relationships(model, model_config['schema'])
+    )
+    if model_config.get('fast_serializer'):
+        default_loaders = ()
+    collection_getter = partial(
+        get_collection,
+        db_session,
+        prepared_query(
+            model_to_query=model,
+            join_attrs=join_attrs,
+            attrs_to_filter=attrs_to_filter[1:],
+            options=loaders.get('collection', default_loaders),
+        ),
+        model_config['collection_serializer'],
+        cursor_attrs=cursor_attrs,
+        cursor_fields=tuple(column_field(a) for a in cursor_attrs),
+        cursor_secret=model_config.get('cursor_secret'),
+        counter=counter_for(
+            model_config.get('count', 'exact'),
+            model_config.get('count_ttl', 60),
+        ),
+        stream_chunk_size=model_config.get('stream_chunk_size'),
+    )
+    item_getter = partial(
+        get_item,
+        db_session,
+        prepared_query(
+            model_to_query=model,
+            join_attrs=join_attrs,
+            attrs_to_filter=attrs_to_filter,
+            options=loaders.get('item', default_loaders),
+        ),
+        model_config['item_serializer'],
+        version_attr=model_attr(model, model_config.get('version_attr')),
+        last_modified_attr=model_attr(
+            model, model_config.get('last_modified_attr')
+        ),
+    )
+    if cache is not None:
+        collection_getter = cached_handler(cache, ps, collection_getter)
+        item_getter = cached_handler(cache, ps, item_getter)
+    if model_config.get('compress', True):
+        compress = partial(
+            compressing_handler,
+            levels=model_config.get('compress_levels'),
+            min_size=model_config.get('compress_min_size', COMPRESS_MIN_SIZE),
+        )
+        collection_getter = compress(collection_getter)
+        item_getter = compress(item_getter)
+    if model_config.get('etag', True):
+        collection_getter = conditional_handler(collection_getter)
+        item_getter = conditional_handler(item_getter)
     endpoints['collection']['GET'] = (
         col_rule, get_handler(
-            partial(
-                get_collection,
-                db_session,
-                collection_query,
-                model_config['collection_serializer'],
-            ),
-            model_config.get('specs', {})
+            collection_getter,
+            model_config.get('specs', {}),
+            collection_keys,
         )
     )
     h = partial(
@@ -159,6 +264,7 @@ def apis_for_path(path, config, db_session, graph):
         model_config['exposed_attr'],
         root_adder,
         model_config['item_deserializer'],
+        bulk_adder=root_bulk_adder,
     )
 
     del_h = partial(
@@ -166,27 +272,41 @@ def apis_for_path(path, config, db_session, graph):
         db_session,
         item_query,
     )
+    bulk_del_h = partial(
+        delete_collection,
+        db_session,
+        collection_query,
+        getattr(model, model_config['exposed_attr']),
+    )
 
     if parent:
         rel_attr = graph[parent][model]['rel_attr']
-        child_query = partial(
-            query,
+        child_query = prepared_query(
             model_to_query=model,
             attrs_to_filter=attrs_to_filter[0:1],
         )
-        parent_query = partial(
-            query,
+        parent_query = prepared_query(
             model_to_query=parent,
             join_attrs=join_attrs[1:],
             attrs_to_filter=attrs_to_filter[1:]
         )
         if is_many_to_many(graph, model, parent):
+            relationship = inspect(parent).relationships[rel_attr]
+            # Links are posted as ids, not as items of the model.
+            item_body_validator = None
             h = partial(
                 post_item_many_to_many,
                 db_session,
                 child_query,
                 parent_query,
                 rel_attr,
+                bulk_linker=partial(
+                    link_many_to_many,
+                    db_session,
+                    parent_query,
+                    relationship,
+                    getattr(model, model_config['exposed_attr']),
+                ),
             )
             del_h = partial(
                 delete_many_to_many,
@@ -195,6 +315,13 @@ def apis_for_path(path, config, db_session, graph):
                 parent_query,
                 rel_attr
             )
+            bulk_del_h = partial(
+                unlink_many_to_many,
+                db_session,
+                parent_query,
+                relationship,
+                getattr(model, model_config['exposed_attr']),
+            )
         else:
             h = partial(
                 post_item,
@@ -206,35 +333,116 @@ def apis_for_path(path, config, db_session, graph):
                     rel_attr,
                 ),
                 model_config['item_deserializer'],
+                bulk_adder=partial(
+                    non_root_bulk_adder,
+                    parent_query,
+                    rel_attr,
+                ),
             )
     endpoints['collection']['POST'] = (
-        col_rule, data_handler(h)
+        col_rule, data_handler(
+            h, collection_keys, max_body_size, item_body_validator
+        )
     )
-    endpoints['item']['GET'] = (
-        item_rule, create_handler(
-            partial(
-                get_item,
-                db_session,
-                item_query,
-                model_config['item_serializer']
+    if not (parent and is_many_to_many(graph, model, parent)):
+        endpoints['collection']['PATCH'] = (
+            col_rule, collection_data_handler(
+                partial(
+                    patch_collection,
+                    db_session,
+                    collection_query,
+                    getattr(model, model_config['exposed_attr']),
+                ),
+                model_config.get('specs', {}),
+                collection_keys,
+                max_body_size,
             )
         )
+        endpoints['collection']['DELETE'] = (
+            col_rule, collection_data_handler(
+                bulk_del_h,
+                model_config.get('specs', {}),
+                collection_keys,
+                max_body_size,
+            )
+        )
+    else:
+        endpoints['collection']['DELETE'] = (
+            col_rule, collection_data_handler(
+                bulk_del_h, keys=collection_keys, max_body_size=max_body_size
+            )
+        )
+    endpoints['item']['GET'] = (
+        item_rule, get_item_handler(item_getter, item_keys)
     )
+    if has_update_hooks(model):
+        patch_h = partial(patch_item, db_session, item_query)
+    else:
+        patch_h = partial(
+            update_item,
+            db_session,
+            item_query,
+            getattr(model, model_config['exposed_attr']),
+        )
     endpoints['item']['PATCH'] = (
         item_rule, data_handler(
-            partial(
-                patch_item,
-                db_session,
-                collection_query,
-            )
+            partial(patch_h, validator=model_config.get('item_validator')),
+            item_keys,
+            max_body_size,
+            body_validator(body_schema, partial=True),
         )
     )
     endpoints['item']['DELETE'] = (
-        item_rule, create_handler(del_h)
+        item_rule, create_handler(del_h, item_keys)
     )
+    if cache is not None:
+        for eps in endpoints.values():
+            for method, (rule, handler) in list(iteritems(eps)):
+                if method != 'GET':
+                    eps[method] = (
+                        rule, invalidating_handler(cache, ps, handler)
+                    )
+    if isinstance(db_session, scoped_session):
+        for eps in endpoints.values():
+            for method, (rule, handler) in list(iteritems(eps)):
+                eps[method] = (rule, session_handler(db_session, handler))
     return model, endpoints
 
 
+def endpoint_methods(graph, model, parent):
+    if parent and is_many_to_many(graph, model, parent):
+        collection = ('GET', 'POST', 'DELETE')
+    else:
+        collection = ('GET', 'POST', 'PATCH', 'DELETE')
+    return {'collection': collection, 'item': ('GET', 'PATCH', 'DELETE')}
+
+
+# Registers the same rules as apis_for_path, but the handlers of the path
+# are only built when one of them gets its first request.
+def lazy_apis_for_path(path, config, db_session, graph, cache=None,
+                       url_rules=None):
+    model, parent = path[-1], path[-2]
+    rules = dict(zip(
+        ('collection', 'item'),
+        url_rules or url_rules_for_path(path[1:], config, graph),
+    ))
+    build = once(partial(
+        apis_for_path, path, config, db_session, graph, cache, url_rules
+    ))
+    return model, {
+        kind: {
+            method: (rules[kind], partial(lazy_handler, build, kind, method))
+            for method in methods
+        }
+        for kind, methods in iteritems(endpoint_methods(graph, model, parent))
+    }
+
+
+def lazy_handler(build, kind, method, *args, **kwargs):
+    model, endpoints = build()
+    return endpoints[kind][method][1](*args, **kwargs)
+
+
 def register_handlers(app, endpoint_params):
     for ep in endpoint_params:
         app.add_url_rule(**ep._asdict())
@@ -244,40 +452,104 @@ def default_config(models, db_session=None):
     return {m: default_cfg_for_model(m, db_session) for m in models}
 
 
-def register_all_apis(app, schemas, all_apis):
+def register_all_apis(app, schemas, all_apis, dispatcher=False,
+                      schemas_max_age=SCHEMAS_MAX_AGE,
+                      schema_per_model=False, encoder=None):
+    if encoder is not None:
+        use_encoder(app, encoder)
     endpoints = chain.from_iterable(
         (api.values() for api in all_apis)
     )
     eps = endpoints_params(chain.from_iterable(endpoints))
+    if dispatcher:
+        register_dispatcher(app, eps)
+        eps = []
     def links_dest_as_str(links):
         return tuple(map(lambda l: dmap(str, l, 'schema_key'), links))
+    schemas = {
+        m: dmap(links_dest_as_str, schema, 'links',)
+        for m, schema in iteritems(schemas)
+    }
     eps.append(
         EndpointParams(
             rule='/schemas',
             endpoint='schemas',
             view_func=partial(
-                schemas_handler,
-                {
-                    str(m): dmap(links_dest_as_str, schema, 'links',)
-                    for m, schema in iteritems(schemas)
-                }
+                precomputed_handler,
+                precomputed_json(
+                    {str(m): schema for m, schema in iteritems(schemas)}
+                ),
+                schemas_max_age,
             ),
             methods=['GET']
         )
     )
+    if schema_per_model:
+        eps.append(
+            EndpointParams(
+                rule='/schemas/<name>',
+                endpoint='model_schema',
+                view_func=partial(
+                    model_schema_handler,
+                    {
+                        m.__name__: precomputed_json(schema)
+                        for m, schema in iteritems(schemas)
+                    },
+                    schemas_max_age,
+                ),
+                methods=['GET']
+            )
+        )
     register_handlers(app, eps)
 
 
 def create_api(root_model, db_session,
                config_decorator=identity,
                graph_decorator=identity,
-               paths_decorator=identity):
-    graph = graph_decorator(create_graph(root_model))
-    config = config_decorator(default_config(graph.nodes(), db_session))
-    ps = tuple(paths_decorator(all_paths(graph, root_model)))
+               paths_decorator=identity,
+               scopefunc=None,
+               cache=None,
+               lazy=False,
+               graph_cache=None,
+               max_depth=None,
+               max_paths=None,
+               edge_filter=None):
+    db_session = request_scoped_session(db_session, scopefunc)
+    fingerprint = graph_cache and graph_fingerprint(
+        root_model, graph_decorator, max_depth, max_paths, edge_filter
+    )
+    cached = graph_cache and load_graph_cache(
+        graph_cache, root_model, fingerprint
+    )
+    if cached:
+        graph, paths = cached['graph'], cached['paths']
+        url_rules = cached['url_rules']
+    else:
+        graph = graph_decorator(create_graph(root_model))
+        paths = tuple(all_paths(
+            graph, root_model, max_depth, max_paths, edge_filter
+        ))
+        url_rules = {}
+    config = compile_serializers(
+        config_decorator(default_config(graph.nodes(), db_session))
+    )
+    ps = tuple(paths_decorator(paths))
+    rules_count = len(url_rules)
+    for path in ps:
+        key = url_rules_key(path, config)
+        if key not in url_rules:
+            url_rules[key] = url_rules_for_path(path, config, graph)
+    if graph_cache and (not cached or len(url_rules) != rules_count):
+        save_graph_cache(
+            graph_cache, root_model, graph, paths, url_rules, fingerprint
+        )
     all_ps = tuple(reversed(ps))
+    make_apis = lazy_apis_for_path if lazy else apis_for_path
     apis = [
-        apis_for_path((None,) + path, config, db_session, graph)
+        make_apis(
+            (None,) + path, config, db_session, graph, cache,
+            url_rules[url_rules_key(path, config)],
+        )
         for path in all_ps
     ]
     apis_by_model = list_dict(apis)
@@ -285,6 +557,16 @@ def create_api(root_model, db_session,
     return apis_by_model, schemas
 
 
+def compile_serializers(config):
+    for m, conf in iteritems(config):
+        if conf.get('fast_serializer'):
+            conf['item_serializer'] = row_serializer(m, conf['schema'])
+            conf['collection_serializer'] = row_serializer(
+                m, conf['schema'], many=True
+            )
+    return config
+
+
 def my_getitem(index, list_):
     return list_[index]
 
@@ -303,6 +585,10 @@ def serializers_maker(model, schema_factory, db_session):
     return item_serializer, collection_serializer, item_deserializer
 
 
+def validator_maker(model, schema_factory, db_session):
+    return partial(validate_item, schema_factory(model)(), db_session)
+
+
 def default_cfg_for_model(model, db_session):
     i_ser, col_ser, i_des = serializers_maker(
         model, create_schema, db_session
@@ -313,9 +599,25 @@ def default_cfg_for_model(model, db_session):
         'schema': create_schema(model),
         'collection_serializer': col_ser,
         'item_deserializer': i_des,
+        'item_validator': validator_maker(model, create_schema, db_session),
         'exposed_attr': pk_attr_name(model)[0],
         'exposed_attr_type': 'int:' if pk_attr_name(model)[1] == int else '',
         'specs': {},
+        'sort_attr': None,
+        'cursor_secret': None,
+        'count': 'exact',
+        'count_ttl': 60,
+        'stream_chunk_size': None,
+        'loader_options': {},
+        'fast_serializer': False,
+        'etag': True,
+        'version_attr': None,
+        'last_modified_attr': None,
+        'max_body_size': None,
+        'validate_body': True,
+        'compress': True,
+        'compress_levels': None,
+        'compress_min_size': COMPRESS_MIN_SIZE,
     }
 
 
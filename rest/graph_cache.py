@@ -0,0 +1,85 @@
+import os
+import pickle
+from tempfile import NamedTemporaryFile
+
+from sqlalchemy import inspect
+
+GRAPH_CACHE_VERSION = 3
+
+
+def qualified_name(f):
+    if f is None:
+        return None
+    name = getattr(f, '__qualname__', getattr(f, '__name__', None))
+    if name is None:
+        return repr(f)
+    return '{}.{}'.format(getattr(f, '__module__', None), name)
+
+
+# Describes everything the cached graph and paths are computed from: the
+# tables and relationships of the models reachable from root_model, the
+# path limits and the names of the functions that alter the graph.
+def graph_fingerprint(root_model, graph_decorator=None, max_depth=None,
+                      max_paths=None, edge_filter=None):
+    models = {}
+    pending = [root_model]
+    while pending:
+        mapper = inspect(pending.pop())
+        if mapper.class_ in models:
+            continue
+        models[mapper.class_] = (
+            tuple(sorted(t.name for t in mapper.tables)),
+            tuple(sorted(
+                (key, r.direction.name, qualified_name(r.mapper.class_))
+                for key, r in mapper.relationships.items()
+            )),
+        )
+        pending.extend(r.mapper.class_ for r in mapper.relationships)
+    return (
+        tuple(sorted(
+            (qualified_name(m), desc) for m, desc in models.items()
+        )),
+        max_depth,
+        max_paths,
+        qualified_name(graph_decorator),
+        qualified_name(edge_filter),
+    )
+
+
+# The file holds the model graph, its paths and url rules computed for
+# root_model. It's only used when it was written for the same root model
+# and fingerprint, anything else is a miss and gets rebuilt.
+def load_graph_cache(path, root_model, fingerprint=None):
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError,
+            AttributeError, ImportError):
+        return None
+    if (cached.get('version') != GRAPH_CACHE_VERSION or
+            cached.get('root') is not root_model or
+            cached.get('fingerprint') != fingerprint):
+        return None
+    return cached
+
+
+def save_graph_cache(path, root_model, graph, paths, url_rules,
+                     fingerprint=None):
+    cached = {
+        'version': GRAPH_CACHE_VERSION,
+        'root': root_model,
+        'fingerprint': fingerprint,
+        'graph': graph,
+        'paths': paths,
+        'url_rules': url_rules,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    with NamedTemporaryFile('wb', dir=directory, delete=False) as f:
+        pickle.dump(cached, f, pickle.HIGHEST_PROTOCOL)
+    getattr(os, 'replace', os.rename)(f.name, path)
+
+
+def url_rules_key(path, config):
+    return path, tuple(
+        (config[m]['url_name'], config[m]['exposed_attr_type']) for m in path
+    )
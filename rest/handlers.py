@@ -1,16 +1,63 @@
 import json
 
 from functools import partial
-from rest.helpers import compose_wrappers, add_item
-
-from flask import jsonify, request
-from marshmallow_sqlalchemy import ModelSchema
+from hashlib import sha1
+from rest.compression import (
+    best_encoding,
+    compress,
+    compress_stream,
+    compressed_variants,
+    compressors,
+)
+from rest.decoding import BodyError, decode_body, read_body
+from rest.encoders import current_encoder, default, json_response
+from rest.helpers import add_item, chunks
+from rest.introspect import (
+    column_attrs,
+    foreign_key_values,
+    mapped_attrs,
+)
+from rest.query import (
+    UnknownFieldsError,
+    exact_count,
+    link_statement,
+    load_only_fields,
+    parent_key_columns,
+    rows_query,
+    unlink_statement,
+)
+
+from flask import (
+    Response,
+    current_app,
+    request,
+    stream_with_context,
+)
+from itsdangerous import BadData, BadSignature, URLSafeSerializer
+from marshmallow import ValidationError
+from marshmallow_sqlalchemy import ModelConverter, ModelSchema
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm.exc import NoResultFound
 from six import iteritems
 
 NO_SUCH_ITEM_MESSAGE = 'No such item resourse'
 NO_SUCH_PARENT_MESSAGE = 'No such parent resource'
 NO_SUCH_RESOURCE_MESSAGE = 'No such resource'
+INVALID_CURSOR_MESSAGE = 'Invalid cursor'
+NO_CURSOR_SECRET_MESSAGE = 'Cursors need a secret key'
+UNKNOWN_FIELDS_MESSAGE = 'Unknown fields: {}'
+NO_ROWS_SELECTED_MESSAGE = 'Either ids or spec is required'
+NO_SUCH_SPEC_MESSAGE = 'No such spec for this resource'
+INVALID_SPEC_MESSAGE = 'Invalid spec'
+INVALID_PAGE_MESSAGE = 'page and size have to be positive integers'
+INVALID_LINKS_MESSAGE = 'Links have to be objects with an id'
+INVALID_IDS_MESSAGE = 'ids has to be a list'
+NOT_AN_OBJECT_MESSAGE = 'Request body has to be an object'
+INVALID_VALUES_MESSAGE = 'data has to be a non-empty object'
+CURSOR_SALT = 'rest.cursor'
+STATIC_COMPRESSION_LEVELS = {'gzip': 9, 'br': 11}
+COMPRESS_MIN_SIZE = 1024
 
 
 def get_collection(db_session, query, serializer, *keys, **kwargs):
@@ -19,46 +66,260 @@ def get_collection(db_session, query, serializer, *keys, **kwargs):
     count = kwargs.get('count', None)
     page_num = kwargs.get('page_num', None)
     page_size = kwargs.get('page_size', None)
+    after = kwargs.get('after', None)
+    cursor_attrs = kwargs.get('cursor_attrs', ())
+    cursor_fields = kwargs.get('cursor_fields', None)
+    cursor_secret = kwargs.get('cursor_secret', None)
+    counter = kwargs.get('counter', exact_count)
+    stream_chunk_size = kwargs.get('stream_chunk_size', None)
+    fields = kwargs.get('fields', None)
     cq = query(session=db_session, keys=keys)
     scq = spec(cq)
-    if page_num is not None and page_size is not None:
-        count = scq.count()
+    try:
+        scq, serializer = restrict_to_fields(
+            scq, serializer, fields, cursor_attrs
+        )
+    except UnknownFieldsError as e:
+        return UNKNOWN_FIELDS_MESSAGE.format(', '.join(e.fields)), 400
+    if after is not None and page_size is not None and cursor_attrs:
+        secret = cursor_secret or current_app.secret_key
+        if not secret:
+            return NO_CURSOR_SECRET_MESSAGE, 400
+        if cursor_fields is None:
+            cursor_fields = tuple(column_field(a) for a in cursor_attrs)
+        try:
+            values = decode_cursor(after, len(cursor_attrs), cursor_fields,
+                                   secret)
+            q = seek(scq, cursor_attrs, values)
+        except (BadData, ValidationError):
+            return INVALID_CURSOR_MESSAGE, 400
+        items = q.limit(page_size + 1).all()
+        output = serializer(items[:page_size])
+        output['count'] = len(items[:page_size])
+        output['next'] = None
+        if len(items) > page_size:
+            output['next'] = encode_cursor(
+                [getattr(items[page_size - 1], a.key) for a in cursor_attrs],
+                cursor_fields,
+                secret,
+            )
+    elif page_num is not None and page_size is not None:
+        count = counter(scq)
         offset = (page_num - 1) * page_size
-        q = scq.offset(offset).limit(page_size)
-        items = q.all()
-        output = serializer(items)
-        output['total'] = count
-        output['count'] = len(items)
+        if count is None:
+            items = scq.offset(offset).limit(page_size + 1).all()
+            output = serializer(items[:page_size])
+            output['has_more'] = len(items) > page_size
+            output['count'] = len(items[:page_size])
+        else:
+            q = scq.offset(offset).limit(page_size)
+            items = q.all()
+            output = serializer(items)
+            output['total'] = count
+            output['count'] = len(items)
+    elif stream_chunk_size:
+        return stream_collection(serializer, scq, stream_chunk_size)
     else:
         output = serializer(scq.all())
-    return jsonify(output)
+    return json_response(output)
+
+
+def stream_collection(serializer, query, chunk_size):
+    encode = current_encoder()
+
+    def generate():
+        yield b'{"items":['
+        separator = b''
+        for chunk in chunks(query.yield_per(chunk_size), chunk_size):
+            yield separator + b','.join(
+                encode(i) for i in serializer(chunk)['items']
+            )
+            separator = b','
+        yield b']}'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/json',
+    )
+
+
+def restrict_to_fields(query, serializer, fields, required_attrs=()):
+    columns = getattr(serializer, 'columns', None)
+    if columns is not None:
+        if fields:
+            serializer = serializer.only(fields)
+        extra = tuple(a for a in required_attrs
+                      if a.key not in serializer.names)
+        query = query.with_entities(*(serializer.columns + extra))
+    elif fields:
+        query = load_only_fields(query, fields, required_attrs)
+        serializer = partial(serializer, only=fields)
+    return query, serializer
+
+
+def seek(query, cursor_attrs, values):
+    ordered = query.order_by(*cursor_attrs)
+    if not values:
+        return ordered
+    conditions = [
+        and_(*([a == v for a, v in zip(cursor_attrs[:i], values)] +
+               [cursor_attrs[i] > values[i]]))
+        for i in range(len(cursor_attrs))
+    ]
+    return ordered.filter(or_(*conditions))
+
+
+def cursor_serializer(secret=None):
+    return URLSafeSerializer(
+        secret or current_app.secret_key,
+        salt=CURSOR_SALT,
+        serializer_kwargs={'default': default},
+    )
+
+
+# Cursor values go through the fields the model's columns convert to, so
+# dates, decimals and the like survive the round trip through JSON.
+def column_field(attr):
+    return ModelConverter().property2field(attr.property)
+
+
+def encode_cursor(values, fields=None, secret=None):
+    if fields is not None:
+        values = [f._serialize(v, None, None) for f, v in zip(fields, values)]
+    return cursor_serializer(secret).dumps(values)
 
 
-def get_item(db_session, query, serializer, *keys):
+def decode_cursor(token, length, fields=None, secret=None):
+    if not token:
+        return ()
+    values = cursor_serializer(secret).loads(token)
+    if not isinstance(values, list) or len(values) != length:
+        raise BadSignature(INVALID_CURSOR_MESSAGE)
+    if fields is not None:
+        values = [f.deserialize(v) for f, v in zip(fields, values)]
+    return values
+
+
+def get_item(db_session, query, serializer, *keys, **kwargs):
+    fields = kwargs.get('fields', None)
+    validator_attrs = tuple(
+        a for a in (kwargs.get('version_attr', None),
+                    kwargs.get('last_modified_attr', None))
+        if a is not None
+    )
     item_query = query(session=db_session, keys=keys)
+    validators = None
+    try:
+        if validator_attrs and (request.if_none_match or
+                                request.if_modified_since):
+            validators = item_query.with_entities(*validator_attrs).one()
+            response = conditional_response(
+                Response(), fields, *item_validators(validators, **kwargs)
+            )
+            if response.status_code == 304:
+                return response
+        item_query, serializer = restrict_to_fields(
+            item_query, serializer, fields, validator_attrs
+        )
+    except UnknownFieldsError as e:
+        return UNKNOWN_FIELDS_MESSAGE.format(', '.join(e.fields)), 400
+    except NoResultFound:
+        return NO_SUCH_RESOURCE_MESSAGE, 404
     try:
         item = item_query.one()
-        return jsonify(serializer(item))
     except NoResultFound:
         return NO_SUCH_RESOURCE_MESSAGE, 404
+    return conditional_response(
+        json_response(serializer(item)),
+        fields,
+        *item_validators(validators or item, **kwargs)
+    )
+
+
+def item_validators(item, version_attr=None, last_modified_attr=None,
+                    **kwargs):
+    return tuple(getattr(item, a.key, None) if a is not None else None
+                 for a in (version_attr, last_modified_attr))
+
+
+def conditional_response(response, fields, version, last_modified):
+    if version is not None:
+        response.set_etag(
+            '-'.join((str(version),) + tuple(fields or ()))
+        )
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response.make_conditional(request)
 
 
 def post_item(db_session, exposed_attr, adder, deserializer, *keys, **kwargs):
+    data = kwargs.pop('data')
+    if isinstance(data, list):
+        return post_items(
+            db_session,
+            exposed_attr,
+            kwargs.get('bulk_adder', None) or partial(each_adder, adder),
+            deserializer,
+            data,
+            *keys
+        )
     try:
-        item = deserializer(kwargs.pop('data'))
+        item = deserializer(data)
         adder(db_session, item, *keys)
         db_session.commit()
-        return jsonify({'id': getattr(item, exposed_attr)})
+        return json_response({'id': getattr(item, exposed_attr)})
     except SchemaError as e:
-        return json.dumps(e.errors), 400
+        return json_response(e.errors, 400)
     except NoResultFound as e:
         return 'Parent resource not found', 404
 
 
+def post_items(db_session, exposed_attr, adder, deserializer, data, *keys):
+    items, errors = [], {}
+    for i, d in enumerate(data):
+        try:
+            items.append(deserializer(d))
+        except SchemaError as e:
+            errors[i] = e.errors
+    if errors:
+        return json_response(errors, 400)
+    try:
+        adder(db_session, items, *keys)
+        # Read before commit expires the items, which would reload each one.
+        db_session.flush()
+        ids = [getattr(i, exposed_attr) for i in items]
+        db_session.commit()
+        return json_response({'ids': ids})
+    except NoResultFound:
+        return 'Parent resource not found', 404
+
+
 def root_adder(db_session, item, *keys):
     db_session.add(item)
 
 
+def each_adder(adder, db_session, items, *keys):
+    for item in items:
+        adder(db_session, item, *keys)
+
+
+def root_bulk_adder(db_session, items, *keys):
+    db_session.add_all(items)
+
+
+def non_root_bulk_adder(query, rel_attr_name, db_session, items, *keys):
+    parent = query(session=db_session, keys=keys).one()
+    values = foreign_key_values(parent, rel_attr_name)
+    if values is None:
+        db_session.add(parent)
+        for item in items:
+            add_item(parent, rel_attr_name, item)
+        return
+    for item in items:
+        for attr, value in iteritems(values):
+            setattr(item, attr, value)
+    db_session.add_all(items)
+
+
 def non_root_adder(query, rel_attr_name, db_session, item, *keys):
     parent = query(session=db_session, keys=keys).one()
     db_session.add(parent)
@@ -67,8 +328,16 @@ def non_root_adder(query, rel_attr_name, db_session, item, *keys):
 
 def post_item_many_to_many(db_session, item_query, parent_query, rel_attr_name,
                            *keys, **kwargs):
+    data = kwargs.pop('data')
+    bulk_linker = kwargs.get('bulk_linker', None)
+    bulk = isinstance(data, list) and bulk_linker is not None
+    links = data if bulk else [data]
+    if not all(isinstance(d, dict) and 'id' in d for d in links):
+        return INVALID_LINKS_MESSAGE, 400
+    if bulk:
+        return bulk_linker(*keys, ids=[d['id'] for d in data])
     try:
-        _id = kwargs.pop('data')['id']
+        _id = data['id']
         item = item_query(session=db_session, keys=(_id,)).one()
     except NoResultFound:
         return NO_SUCH_ITEM_MESSAGE, 404
@@ -83,6 +352,37 @@ def post_item_many_to_many(db_session, item_query, parent_query, rel_attr_name,
             return NO_SUCH_PARENT_MESSAGE, 404
 
 
+def link_many_to_many(db_session, parent_query, relationship, child_attr,
+                      *keys, **kwargs):
+    return change_links(link_statement, db_session, parent_query,
+                        relationship, child_attr, kwargs['ids'], keys)
+
+
+def unlink_many_to_many(db_session, parent_query, relationship, child_attr,
+                        *keys, **kwargs):
+    ids = (kwargs.pop('data', None) or {}).get('ids')
+    if ids is None:
+        return NO_ROWS_SELECTED_MESSAGE, 400
+    if not isinstance(ids, list):
+        return INVALID_IDS_MESSAGE, 400
+    return change_links(unlink_statement, db_session, parent_query,
+                        relationship, child_attr, ids, keys)
+
+
+def change_links(statement, db_session, parent_query, relationship,
+                 child_attr, ids, keys):
+    try:
+        parent_values = parent_query(session=db_session, keys=keys) \
+            .with_entities(*parent_key_columns(relationship)).one()
+    except NoResultFound:
+        return NO_SUCH_PARENT_MESSAGE, 404
+    result = db_session.execute(statement(
+        db_session, relationship, parent_values, child_attr, ids
+    ))
+    db_session.commit()
+    return json_response({'count': result.rowcount})
+
+
 def delete_item(db_session, query, *keys):
     try:
         db_session.delete(query(session=db_session, keys=keys).one())
@@ -110,11 +410,21 @@ def delete_many_to_many(db_session, item_query, parent_query,
 
 
 def patch_item(db_session, query, *keys, **kwargs):
+    data = kwargs.pop('data')
+    if not isinstance(data, dict):
+        return NOT_AN_OBJECT_MESSAGE, 400
+    errors = validation_errors(kwargs.get('validator', None), data)
+    if errors:
+        return json_response(errors, 400)
     item_query = query(session=db_session, keys=keys)
+    attrs = mapped_attrs(item_query.column_descriptions[0]['entity'])
+    unknown = [a for a in data if a not in attrs]
+    if unknown:
+        return UNKNOWN_FIELDS_MESSAGE.format(', '.join(unknown)), 400
     try:
         item = item_query.one()
         db_session.add(item)
-        for attr, new_value in iteritems(kwargs.pop('data')):
+        for attr, new_value in iteritems(data):
             setattr(item, attr, new_value)
         db_session.commit()
         return '', 200
@@ -122,66 +432,355 @@ def patch_item(db_session, query, *keys, **kwargs):
         return NO_SUCH_RESOURCE_MESSAGE, 404
 
 
-def schemas_handler(schemas):
-    return jsonify(schemas)
+# Issues a single UPDATE instead of loading the row. Only usable for models
+# without update hooks, and falls back to patch_item when the data touches
+# anything that isn't a plain column.
+def update_item(db_session, query, exposed_attr, *keys, **kwargs):
+    data = kwargs['data']
+    columns = column_attrs(exposed_attr.class_)
+    if (not isinstance(data, dict) or not data or
+            any(a not in columns for a in data)):
+        return patch_item(db_session, query, *keys, **kwargs)
+    errors = validation_errors(kwargs.get('validator', None), data)
+    if errors:
+        return json_response(errors, 400)
+    count = rows_query(query(session=db_session, keys=keys)) \
+        .update(data, synchronize_session=False)
+    if count == 0:
+        db_session.rollback()
+        return NO_SUCH_RESOURCE_MESSAGE, 404
+    db_session.commit()
+    return '', 200
 
 
-def keys_from_kwargs(**kwargs):
-    return tuple((kwargs[key] for key in sorted(kwargs.keys(), reverse=True)))
+def validation_errors(validator, data):
+    if validator is None:
+        return None
+    try:
+        validator(data)
+    except SchemaError as e:
+        return e.errors
+
+
+def patch_collection(db_session, query, exposed_attr, *keys, **kwargs):
+    data = kwargs.pop('data', None)
+    error = selection_error(data)
+    if error is not None:
+        return error, 400
+    values = data.get('data')
+    if not isinstance(values, dict) or not values:
+        return INVALID_VALUES_MESSAGE, 400
+    unknown = [a for a in values if a not in column_attrs(exposed_attr.class_)]
+    if unknown:
+        return UNKNOWN_FIELDS_MESSAGE.format(', '.join(unknown)), 400
+    rows = selected_rows(db_session, query, exposed_attr, data.get('ids'),
+                         kwargs.get('spec', None), keys)
+    if rows is None:
+        return NO_ROWS_SELECTED_MESSAGE, 400
+    count = rows.update(values, synchronize_session=False)
+    db_session.commit()
+    return json_response({'count': count})
+
+
+def delete_collection(db_session, query, exposed_attr, *keys, **kwargs):
+    data = kwargs.pop('data', None)
+    if data is None:
+        data = {}
+    error = selection_error(data)
+    if error is not None:
+        return error, 400
+    rows = selected_rows(db_session, query, exposed_attr, data.get('ids'),
+                         kwargs.get('spec', None), keys)
+    if rows is None:
+        return NO_ROWS_SELECTED_MESSAGE, 400
+    count = rows.delete(synchronize_session=False)
+    db_session.commit()
+    return json_response({'count': count})
+
+
+def selection_error(data):
+    if not isinstance(data, dict):
+        return NOT_AN_OBJECT_MESSAGE
+    ids = data.get('ids')
+    if ids is not None and not isinstance(ids, list):
+        return INVALID_IDS_MESSAGE
+    return None
+
+
+def selected_rows(db_session, query, exposed_attr, ids, spec, keys):
+    if ids is None and spec is None:
+        return None
+    q = query(session=db_session, keys=keys)
+    if spec is not None:
+        q = spec(q)
+    if ids is not None:
+        q = q.filter(exposed_attr.in_(ids))
+    return rows_query(q)
+
+
+# Serializes and compresses a document that never changes once, so serving
+# it costs a lookup. Every encoding is a different body, so each gets its
+# own ETag, a hash of its bytes.
+def precomputed_json(data):
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    variants = compressed_variants(
+        body.encode('utf-8'), STATIC_COMPRESSION_LEVELS
+    )
+    return {
+        'etags': {e: sha1(v).hexdigest() for e, v in iteritems(variants)},
+        'variants': variants,
+    }
+
+
+def precomputed_handler(document, max_age):
+    variants = document['variants']
+    encoding = best_encoding(variants, request.accept_encodings)
+    etag = document['etags'][encoding]
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(
+            variants[encoding], mimetype='application/json'
+        )
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def model_schema_handler(documents, max_age, name):
+    if name not in documents:
+        return NO_SUCH_RESOURCE_MESSAGE, 404
+    return precomputed_handler(documents[name], max_age)
 
 
-def create_handler(handler):
-    return wrap(handler, keys_wrapper)
+def request_scoped_session(db_session, scopefunc=None):
+    if isinstance(db_session, scoped_session):
+        return db_session
+    if callable(db_session):
+        return scoped_session(db_session, scopefunc=scopefunc)
+    return db_session
 
 
-def wrap(f, wrapper):
-    def z(*args, **kwargs):
-        args, kwargs = wrapper(*args, **kwargs)
-        return f(*args, **kwargs)
-    return z
+def session_handler(db_session, handler):
+    def h(*args, **kwargs):
+        try:
+            response = current_app.make_response(handler(*args, **kwargs))
+        except Exception:
+            db_session.rollback()
+            db_session.remove()
+            raise
+        response.call_on_close(db_session.remove)
+        return response
+    return h
+
+
+def conditional_handler(handler):
+    def h(*args, **kwargs):
+        response = current_app.make_response(handler(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            response.add_etag()
+        return response.make_conditional(request)
+    return h
+
+
+# Compresses successful responses in the encoding the client prefers.
+# Bodies smaller than min_size aren't worth it, streamed ones are
+# compressed as they're produced whatever their size.
+def compressing_handler(handler, levels=None, min_size=COMPRESS_MIN_SIZE):
+    def h(*args, **kwargs):
+        response = current_app.make_response(handler(*args, **kwargs))
+        if (response.status_code != 200 or
+                'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = best_encoding(compressors, request.accept_encodings)
+        if encoding == 'identity':
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(
+                encoding, response.response, levels
+            )
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(compress(encoding, data, levels))
+        response.headers['Content-Encoding'] = encoding
+        # Validators set by the handler describe the uncompressed body.
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+    return h
+
+
+def cached_handler(cache, models, handler):
+    def h(*args, **kwargs):
+        key = cache.key(models, request.path, request.args.items(multi=True))
+        cached = cache.get(key)
+        if cached is not None:
+            data, status, headers = cached
+            return Response(data, status=status, headers=headers)
+        response = current_app.make_response(handler(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            cache.set(
+                key,
+                (response.get_data(), response.status_code,
+                 list(response.headers.items()))
+            )
+        return response
+    return h
+
+
+def invalidating_handler(cache, models, handler):
+    def h(*args, **kwargs):
+        response = current_app.make_response(handler(*args, **kwargs))
+        if response.status_code < 400:
+            cache.invalidate(models)
+        return response
+    return h
 
 
-def keys_wrapper(*args, **kwargs):
-    return keys_from_kwargs(**kwargs), {}
+def keys_from_kwargs(**kwargs):
+    return tuple(kwargs[key] for key in sorted(kwargs, key=key_level,
+                                               reverse=True))
 
 
-def spec_wrapper(specs, *args, **kwargs):
-    spec_as_str = request.args.get('spec', None)
-    if spec_as_str:
-        spec_dict = json.loads(spec_as_str)
-        try:
-            spec = partial(specs[spec_dict['name']], *spec_dict['args'])
-            kwargs['spec'] = spec
-        except KeyError:
-            return 'No such spec for this resource', 400
-    return args, kwargs
+# Sorting names as strings would put level_10_id before level_9_id.
+def key_level(key_name):
+    parts = key_name.split('_')
+    if len(parts) == 3 and parts[1].isdigit():
+        return int(parts[1]), key_name
+    return -1, key_name
 
 
-def request_data_wrapper(*args, **kwargs):
-    kwargs['data'] = json.loads(request.data.decode('utf-8'))
-    return args, kwargs
+# Url rules name their keys level_0_id .. level_N_id, handlers take them
+# from the deepest level up.
+def key_names(count):
+    return tuple('level_{}_id'.format(i) for i in reversed(range(count)))
 
 
-def get_handler(handler, specs={}):
-    w = compose_wrappers(
-        partial(spec_wrapper, specs),
-        cursor_wrapper,
-        keys_wrapper,
-    )
-    return wrap(handler, w)
+def create_handler(handler, keys=None):
+    return compile_handler(handler, keys)
+
+
+class ParamError(ValueError):
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def parse_spec(specs, args):
+    spec_as_str = args.get('spec', None)
+    if not spec_as_str:
+        return None
+    try:
+        spec_dict = json.loads(spec_as_str)
+        name, spec_args = spec_dict['name'], tuple(spec_dict['args'])
+    except (ValueError, TypeError, KeyError):
+        raise ParamError(INVALID_SPEC_MESSAGE)
+    try:
+        return partial(specs[name], *spec_args)
+    except (KeyError, TypeError):
+        raise ParamError(NO_SUCH_SPEC_MESSAGE)
 
 
-def data_handler(handler):
-    w = compose_wrappers(request_data_wrapper, keys_wrapper)
-    return wrap(handler, w)
+def parse_cursor(args):
+    return {
+        'page_num': positive_int(args.get('page', None)),
+        'page_size': positive_int(args.get('size', None)),
+        'after': args.get('after', None),
+    }
 
 
-def cursor_wrapper(*args, **kwargs):
-    page_num = request.args.get('page', None)
-    page_size = request.args.get('size', None)
-    kwargs['page_num'] = int(page_num) if page_num else None
-    kwargs['page_size'] = int(page_size) if page_size else None
-    return args, kwargs
+def positive_int(value):
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ParamError(INVALID_PAGE_MESSAGE)
+    if number < 1:
+        raise ParamError(INVALID_PAGE_MESSAGE)
+    return number
+
+
+def parse_fields(args):
+    fields_as_str = args.get('fields', None)
+    if not fields_as_str:
+        return None
+    return tuple(f for f in fields_as_str.split(',') if f)
+
+
+# Builds the view for an endpoint as one function that reads only what the
+# handler takes from the request. keys are the names of the url variables
+# in the order the handler takes them, they're sorted per request when not
+# given. The body is limited to max_body_size bytes and checked with
+# validator before the handler gets it.
+def compile_handler(handler, keys=None, specs=None, cursor=False,
+                    fields=False, data=None, max_body_size=None,
+                    validator=None):
+    read_data = data is not None
+    optional_data = data == 'optional'
+
+    def handle(**kwargs):
+        if keys is None:
+            key_values = keys_from_kwargs(**kwargs)
+        else:
+            key_values = tuple(kwargs[k] for k in keys)
+        args = request.args
+        handler_kwargs = {}
+        try:
+            if specs is not None:
+                spec = parse_spec(specs, args)
+                if spec is not None:
+                    handler_kwargs['spec'] = spec
+            if cursor:
+                handler_kwargs.update(parse_cursor(args))
+            if fields:
+                only = parse_fields(args)
+                if only:
+                    handler_kwargs['fields'] = only
+        except ParamError as e:
+            return e.message, 400
+        if read_data:
+            try:
+                body = read_body(max_body_size)
+                if body or not optional_data:
+                    handler_kwargs['data'] = decode_body(body, validator)
+            except BodyError as e:
+                if e.errors is not None:
+                    return json_response(e.errors, e.status)
+                return e.message, e.status
+        return handler(*key_values, **handler_kwargs)
+    return handle
+
+
+def collection_data_handler(handler, specs={}, keys=None,
+                            max_body_size=None):
+    return compile_handler(handler, keys, specs=specs, data='optional',
+                           max_body_size=max_body_size)
+
+
+def get_handler(handler, specs={}, keys=None):
+    return compile_handler(handler, keys, specs=specs, cursor=True,
+                           fields=True)
+
+
+def get_item_handler(handler, keys=None):
+    return compile_handler(handler, keys, fields=True)
+
+
+def data_handler(handler, keys=None, max_body_size=None, validator=None):
+    return compile_handler(handler, keys, data='required',
+                           max_body_size=max_body_size, validator=validator)
 
 
 class SchemaError(ValueError):
@@ -200,16 +799,55 @@ def deserialize_item(schema, db_session, item):
         raise SchemaError(result.errors)
 
 
-def serialize_item(schema, item):
+def validate_item(schema, db_session, item):
+    errors = schema.validate(item, db_session, partial=True)
+    if errors:
+        raise SchemaError(errors)
+
+
+def serialize_item(schema, item, only=None):
+    if only:
+        schema = only_schema(schema, only)
     return schema.dump(item).data
 
 
-def serialize_collection(schema, collection):
+def serialize_collection(schema, collection, only=None):
+    if only:
+        schema = only_schema(schema, only)
     return {'items': schema.dump(collection, many=True).data}
 
 
-def create_schema(model_class, meta_dict={}):
-    meta_dict['model'] = model_class
+_only_schemas = {}
+
+
+def only_schema(schema, only, maxsize=256):
+    key = (schema, only)
+    try:
+        return _only_schemas[key]
+    except KeyError:
+        if len(_only_schemas) >= maxsize:
+            _only_schemas.clear()
+        s = _only_schemas[key] = schema.__class__(only=only)
+        return s
+
+
+_schema_classes = {}
+
+
+# Schema classes are shared between every path (and every call) asking for
+# the same model and options, building one is the slow part of startup.
+def create_schema(model_class, meta_dict=None):
+    meta_dict = dict(meta_dict or {}, model=model_class)
+    try:
+        key = frozenset(iteritems(meta_dict))
+    except TypeError:
+        return schema_class(model_class, meta_dict)
+    if key not in _schema_classes:
+        _schema_classes[key] = schema_class(model_class, meta_dict)
+    return _schema_classes[key]
+
+
+def schema_class(model_class, meta_dict):
     schema_meta = type('Meta', (object,), meta_dict)
     return type(
             model_class.__name__ + 'Schema',
@@ -1,6 +1,8 @@
 from functools import reduce
+from itertools import islice
 from collections import Mapping, defaultdict
 from operator import concat
+from threading import Lock
 from six import iteritems
 from six.moves import range
 
@@ -31,10 +33,31 @@ def compose_wrappers(*wrappers):
     return reduce(l, wrappers, wrapper_id)
 
 
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
 def compose(*functions):
     return reduce(lambda f, g: lambda x: f(g(x)), functions, lambda x: x)
 
 
+def once(f):
+    lock = Lock()
+    result = []
+
+    def call():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(f())
+        return result[0]
+    return call
+
+
 def concat_(seqs):
     return reduce(concat, seqs, ())
 
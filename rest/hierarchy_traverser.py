@@ -1,16 +1,173 @@
-from collections import namedtuple
-from itertools import chain
+from collections import OrderedDict, namedtuple
 from split import groupby
-from networkx import DiGraph, all_simple_paths
+from warnings import warn
 from rest.introspect import related_models
-from six import iteritems
-from six.moves import map, filter
+from six import iteritems, iterkeys
+from six.moves import filter
 
 ModelInfo = namedtuple('ModelInfo', 'model url_attr')
 
+TOO_MANY_PATHS_MESSAGE = 'Stopped after {} paths from {}'
+
+
+# Edge attributes, readable like the attribute dicts of networkx edges.
+class Edge(object):
+    __slots__ = ('rel_attr', 'rel_type')
+
+    def __init__(self, rel_attr=None, rel_type=None):
+        self.rel_attr = rel_attr
+        self.rel_type = rel_type
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.__slots__]
+
+    def __eq__(self, other):
+        return isinstance(other, Edge) and self.items() == other.items()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Edge({!r}, {!r})'.format(self.rel_attr, self.rel_type)
+
+
+# Directed graph of models keeping only what the api needs: successors with
+# edge records and predecessors. Implements the subset of the networkx 1.x
+# DiGraph interface used by this package and its decorators.
+class ModelGraph(object):
+    def __init__(self):
+        self._succ = OrderedDict()
+        self._pred = OrderedDict()
+
+    def add_node(self, node):
+        if node not in self._succ:
+            self._succ[node] = OrderedDict()
+            self._pred[node] = OrderedDict()
+
+    def add_edge(self, u, v, rel_attr=None, rel_type=None):
+        self.add_node(u)
+        self.add_node(v)
+        self._succ[u][v] = self._pred[v][u] = Edge(rel_attr, rel_type)
+
+    def remove_edge(self, u, v):
+        del self._succ[u][v]
+        del self._pred[v][u]
+
+    def remove_node(self, node):
+        for v in self._succ.pop(node):
+            del self._pred[v][node]
+        for u in self._pred.pop(node):
+            del self._succ[u][node]
+
+    def __getitem__(self, node):
+        return self._succ[node]
+
+    def __contains__(self, node):
+        return node in self._succ
+
+    def __iter__(self):
+        return iter(self._succ)
+
+    def __len__(self):
+        return len(self._succ)
+
+    # Same nodes and edges, whatever order they were added in.
+    def __eq__(self, other):
+        return (isinstance(other, ModelGraph) and
+                adjacency(self) == adjacency(other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def nodes(self):
+        return list(self._succ)
+
+    def nodes_iter(self):
+        return iter(self._succ)
+
+    def edges(self):
+        return list(self.edges_iter())
+
+    def edges_iter(self):
+        return ((u, v) for u, succ in iteritems(self._succ) for v in succ)
+
+    def has_edge(self, u, v):
+        return u in self._succ and v in self._succ[u]
+
+    def successors(self, node):
+        return list(self._succ[node])
+
+    def successors_iter(self, node):
+        return iterkeys(self._succ[node])
+
+    def predecessors(self, node):
+        return list(self._pred[node])
+
+    def out_degree(self, node):
+        return len(self._succ[node])
+
+    def in_degree(self, node):
+        return len(self._pred[node])
+
+    def copy(self):
+        graph = ModelGraph()
+        for node in self._succ:
+            graph.add_node(node)
+        for u, succ in iteritems(self._succ):
+            for v, edge in iteritems(succ):
+                graph.add_edge(u, v, edge.rel_attr, edge.rel_type)
+        return graph
+
+
+def adjacency(graph):
+    return {u: dict(succ) for u, succ in iteritems(graph._succ)}
+
+
+def to_networkx(graph):
+    from networkx import DiGraph
+    nx_graph = DiGraph()
+    nx_graph.add_nodes_from(graph.nodes_iter())
+    for u, v in graph.edges_iter():
+        nx_graph.add_edge(u, v, **dict(graph[u][v].items()))
+    return nx_graph
+
+
+def from_networkx(nx_graph):
+    graph = ModelGraph()
+    for node in nx_graph.nodes():
+        graph.add_node(node)
+    for u, v, data in nx_graph.edges(data=True):
+        graph.add_edge(u, v, data.get('rel_attr'), data.get('rel_type'))
+    return graph
+
+
+# Lets graph decorators written against networkx graphs be passed as
+# create_api(graph_decorator=networkx_decorator(decorator)).
+def networkx_decorator(decorator):
+    def decorate(graph):
+        return from_networkx(decorator(to_networkx(graph)))
+    return decorate
+
 
 def create_graph(root_model):
-    graph = DiGraph()
+    graph = ModelGraph()
     add_model(graph, root_model)
     return graph
 
@@ -33,18 +190,45 @@ def leaves(graph):
             graph.in_degree(n) in (0, 1)]
 
 
-def all_paths(graph, node):
-    sps = chain.from_iterable(
-        (_paths(graph, node, n) for n in graph.nodes_iter())
-    )
-    return remove_duplicates(sps)
+# Depth-first enumeration of the simple paths starting at node, every path
+# is produced exactly once, so the cost is linear in the number of paths.
+# max_depth limits the number of edges in a path, edge_filter(parent, child,
+# edge_data) excludes edges, and enumeration stops with a warning after
+# max_paths paths.
+def all_paths(graph, node, max_depth=None, max_paths=None, edge_filter=None):
+    def successors(n):
+        return iter([
+            s for s in graph.successors(n)
+            if edge_filter is None or edge_filter(n, s, graph[n][s])
+        ])
+
+    path, on_path, stack = [], set(), []
 
+    def descend(n):
+        path.append(n)
+        if max_depth is None or len(path) <= max_depth:
+            on_path.add(n)
+            stack.append(successors(n))
+        else:
+            path.pop()
 
-def _paths(g, n1, n2):
-    if n1 == n2:
-        return (n1,),
-    else:
-        return map(tuple, all_simple_paths(g, n1, n2))
+    count = 1
+    yield (node,)
+    descend(node)
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+        if child in on_path:
+            continue
+        if max_paths is not None and count >= max_paths:
+            warn(TOO_MANY_PATHS_MESSAGE.format(max_paths, node))
+            return
+        count += 1
+        yield tuple(path) + (child,)
+        descend(child)
 
 
 def remove_duplicates(seq):
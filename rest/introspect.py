@@ -1,6 +1,8 @@
 from rest.helpers import find
 from sqlalchemy import inspect
+from sqlalchemy.orm.base import ONETOMANY
 from collections import namedtuple
+from six import iteritems
 
 
 RelInfo = namedtuple('RelInfo', ['attr', 'direction'])
@@ -21,6 +23,50 @@ def pk_attr_name(model):
     return attr, column_prop.columns[0].type.python_type
 
 
+def column_attrs(model):
+    return tuple(inspect(model).column_attrs.keys())
+
+
+def mapped_attrs(model):
+    return tuple(inspect(model).attrs.keys())
+
+
 def is_pk(attr_column):
     attr, col_prop = attr_column
     return find(lambda c: c.primary_key, col_prop.columns) is not None
+
+
+def dumped_relationships(model, schema):
+    schema = schema() if isinstance(schema, type) else schema
+    relationships = inspect(model).relationships
+    attrs = (field.attribute or name
+             for name, field in iteritems(schema.fields)
+             if not field.load_only)
+    return tuple(a for a in attrs if a in relationships)
+
+
+def foreign_key_values(parent, rel_attr):
+    mapper = inspect(parent.__class__)
+    relationship = mapper.relationships[rel_attr]
+    if relationship.direction != ONETOMANY or \
+            relationship.secondary is not None:
+        return None
+    return {
+        relationship.mapper.get_property_by_column(remote).key: getattr(
+            parent, mapper.get_property_by_column(local).key
+        )
+        for local, remote in relationship.local_remote_pairs
+    }
+
+
+# Validators and update/set listeners only run when rows are loaded and
+# flushed, so PATCH must not bypass the ORM for such models.
+def has_update_hooks(model):
+    mapper = inspect(model)
+    manager = mapper.class_manager
+    return bool(
+        mapper.validators or
+        mapper.dispatch.before_update or
+        mapper.dispatch.after_update or
+        any(manager[attr].dispatch.set for attr in mapper.column_attrs.keys())
+    )
@@ -1,5 +1,24 @@
-from six.moves import zip
+from threading import Lock
+from time import time
+
+from six.moves import range, zip
 from functools import partial, reduce
+from rest.introspect import column_attrs
+from sqlalchemy import (
+    and_,
+    bindparam,
+    exists,
+    inspect,
+    literal,
+    text,
+    tuple_,
+)
+from sqlalchemy.orm import Query, lazyload, load_only
+
+try:
+    from sqlalchemy.orm import selectinload as eager_load
+except ImportError:
+    from sqlalchemy.orm import subqueryload as eager_load
 
 
 def query(session, model_to_query, attrs_to_filter, keys, join_attrs=()):
@@ -20,3 +39,152 @@ def query(session, model_to_query, attrs_to_filter, keys, join_attrs=()):
 
 def filter_(left, right, query):
     return query.filter(left == right)
+
+
+def prepared_query(model_to_query, attrs_to_filter, join_attrs=(),
+                   options=()):
+    names = tuple('key_{}'.format(i) for i in range(len(attrs_to_filter)))
+    prepared = Query(model_to_query)
+    if len(join_attrs) > 0:
+        prepared = prepared.join(*join_attrs)
+    if len(options) > 0:
+        prepared = prepared.options(*options)
+    for attr, name in zip(attrs_to_filter, names):
+        prepared = prepared.filter(attr == bindparam(name))
+    return partial(bind_query, prepared, names)
+
+
+def loader_options(model, rel_attrs):
+    return tuple(eager_load(getattr(model, a)) for a in rel_attrs)
+
+
+def bind_query(prepared, names, session, keys):
+    return prepared.with_session(session).params(dict(zip(names, keys)))
+
+
+class UnknownFieldsError(ValueError):
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return ', '.join(self.fields)
+
+
+def load_only_fields(query, fields, required_attrs=()):
+    model = query.column_descriptions[0]['entity']
+    columns = column_attrs(model)
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise UnknownFieldsError(unknown)
+    not_dumped = (lazyload(getattr(model, r))
+                  for r in inspect(model).relationships.keys())
+    return query.options(
+        load_only(*(tuple(getattr(model, f) for f in fields) +
+                    tuple(required_attrs))),
+        *not_dumped
+    )
+
+
+# The rows selected by query, for bulk UPDATE and DELETE statements. They're
+# matched by primary key, exposed attrs only have to be unique within their
+# parent.
+def rows_query(query):
+    model = query.column_descriptions[0]['entity']
+    pk = inspect(model).primary_key
+    return query.session.query(model).filter(
+        key_in(pk, query.with_entities(*pk))
+    )
+
+
+def parent_key_columns(relationship):
+    return [p for p, _ in relationship.synchronize_pairs]
+
+
+def key_in(columns, query):
+    if len(columns) == 1:
+        return columns[0].in_(query)
+    return tuple_(*columns).in_(query)
+
+
+def link_statement(session, relationship, parent_values, child_attr, ids):
+    parent_pairs = relationship.synchronize_pairs
+    child_pairs = relationship.secondary_synchronize_pairs
+    linked = exists().where(and_(*(
+        [s == v for (_, s), v in zip(parent_pairs, parent_values)] +
+        [s == c for c, s in child_pairs]
+    )))
+    to_link = session.query(*(
+        [literal(v) for v in parent_values] + [c for c, _ in child_pairs]
+    )).filter(child_attr.in_(ids)).filter(~linked)
+    return relationship.secondary.insert().from_select(
+        [s for _, s in parent_pairs + child_pairs],
+        to_link.statement,
+    )
+
+
+def unlink_statement(session, relationship, parent_values, child_attr, ids):
+    parent_pairs = relationship.synchronize_pairs
+    child_pairs = relationship.secondary_synchronize_pairs
+    to_unlink = session.query(*[c for c, _ in child_pairs]) \
+        .filter(child_attr.in_(ids))
+    return relationship.secondary.delete().where(and_(*(
+        [s == v for (_, s), v in zip(parent_pairs, parent_values)] +
+        [key_in([s for _, s in child_pairs], to_unlink.statement)]
+    )))
+
+
+def exact_count(query):
+    return query.count()
+
+
+def no_count(query):
+    return None
+
+
+def cached_count(ttl, counter=exact_count, maxsize=1024):
+    cache = {}
+    lock = Lock()
+
+    def count(query):
+        compiled = query.statement.compile()
+        key = (str(compiled), tuple(sorted(compiled.params.items())))
+        now = time()
+        with lock:
+            expires, value = cache.get(key, (0, None))
+        if expires > now:
+            return value
+        value = counter(query)
+        with lock:
+            if len(cache) >= maxsize:
+                for k in [k for k, (e, _) in cache.items() if e <= now]:
+                    del cache[k]
+            if len(cache) >= maxsize:
+                cache.clear()
+            cache[key] = (now + ttl, value)
+        return value
+    return count
+
+
+def estimated_count(query):
+    bind = query.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return exact_count(query)
+    statement = query.statement.compile(
+        dialect=bind.dialect,
+        compile_kwargs={'literal_binds': True},
+    )
+    # Colons in the inlined literals would be taken for bind parameters.
+    explain = 'EXPLAIN (FORMAT JSON) {}'.format(statement)
+    plan = query.session.execute(text(explain.replace(':', '\\:'))).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def counter_for(mode, ttl=None):
+    counters = {
+        'exact': exact_count,
+        'none': no_count,
+        'estimate': estimated_count,
+    }
+    if mode == 'cached':
+        return cached_count(ttl)
+    return counters[mode]
@@ -0,0 +1,142 @@
+from datetime import date, datetime, time, timedelta, tzinfo
+from uuid import UUID
+
+from rest.helpers import identity
+from rest.query import UnknownFieldsError
+from sqlalchemy import inspect
+from sqlalchemy.orm.base import MANYTOONE
+from six import iteritems, text_type
+from six.moves import zip
+
+
+class UTC(tzinfo):
+    def utcoffset(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        return 'UTC'
+
+    def dst(self, dt):
+        return timedelta(0)
+
+
+utc = UTC()
+
+
+def datetime_(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=utc).isoformat()
+    return value.astimezone(utc).isoformat()
+
+
+def date_(value):
+    return value.isoformat()
+
+
+def time_(value):
+    ret = value.isoformat()
+    if value.microsecond:
+        return ret[:15]
+    return ret
+
+
+converters = {
+    datetime: datetime_,
+    date: date_,
+    time: time_,
+    UUID: str,
+    int: identity,
+    float: identity,
+    bool: identity,
+    str: identity,
+    text_type: identity,
+}
+
+
+def none_safe(converter):
+    if converter is identity:
+        return converter
+
+    def convert(value):
+        return None if value is None else converter(value)
+    return convert
+
+
+# Used in place of serialize_item/serialize_collection partials. Handlers
+# select serializer.columns instead of whole entities when it's present.
+class RowSerializer(object):
+    def __init__(self, names, columns, converters, many=False):
+        self.names = names
+        self.columns = columns
+        self.converters = converters
+        self.many = many
+        self._only = {}
+
+    def __call__(self, rows, only=None):
+        if only:
+            return self.only(only)(rows)
+        if self.many:
+            return {'items': [self.row(r) for r in rows]}
+        return self.row(rows)
+
+    def row(self, row):
+        return {n: c(v) for n, c, v in zip(self.names, self.converters, row)}
+
+    def only(self, fields):
+        try:
+            return self._only[fields]
+        except KeyError:
+            unknown = [f for f in fields if f not in self.names]
+            if unknown:
+                raise UnknownFieldsError(unknown)
+            indexes = [self.names.index(f) for f in fields]
+            serializer = self._only[fields] = RowSerializer(
+                tuple(self.names[i] for i in indexes),
+                tuple(self.columns[i] for i in indexes),
+                tuple(self.converters[i] for i in indexes),
+                self.many,
+            )
+            return serializer
+
+
+def row_serializer(model, schema, many=False):
+    schema = schema() if isinstance(schema, type) else schema
+    mapper = inspect(model)
+    fields = [(name, field) for name, field in iteritems(schema.fields)
+              if not field.load_only]
+    names, columns, convs = [], [], []
+    for name, field in fields:
+        attr = field.attribute or name
+        if attr in mapper.column_attrs:
+            column_prop = mapper.column_attrs[attr]
+        elif attr in mapper.relationships:
+            column_prop = foreign_key_prop(mapper, mapper.relationships[attr])
+        else:
+            raise ValueError(
+                '{} of {} is not a column'.format(name, model.__name__)
+            )
+        names.append(name)
+        columns.append(getattr(model, column_prop.key).label(name))
+        convs.append(converter_for(column_prop, field))
+    return RowSerializer(tuple(names), tuple(columns), tuple(convs), many)
+
+
+def foreign_key_prop(mapper, relationship):
+    pairs = relationship.local_remote_pairs
+    remote_pk = inspect(relationship.mapper.class_).primary_key
+    if (relationship.direction != MANYTOONE or len(pairs) != 1 or
+            len(remote_pk) != 1 or pairs[0][1] is not remote_pk[0]):
+        raise ValueError(
+            '{} is not a simple many-to-one relationship'.format(relationship)
+        )
+    return mapper.get_property_by_column(pairs[0][0])
+
+
+def converter_for(column_prop, field):
+    try:
+        python_type = column_prop.columns[0].type.python_type
+    except NotImplementedError:
+        python_type = None
+    if python_type in converters:
+        return none_safe(converters[python_type])
+    return none_safe(lambda value: field._serialize(value, None, None))
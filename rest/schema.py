@@ -15,35 +15,137 @@ from marshmallow.fields import (
     Email,
 )
 from marshmallow.validate import Length, OneOf, Range, Regexp
-from functools import reduce
+from marshmallow import class_registry
+from functools import partial, reduce
+from six import string_types
 
+_jsonschemas = {}
+_ref_jsonschemas = {}
+_converters = {}
 
-def to_jsonschema(mschema):
+
+# Conversions are cached by schema class, the result only depends on its
+# declared fields. With definitions=True every nested schema is emitted
+# once under 'definitions' and referenced with '$ref', otherwise nested
+# schemas are inlined and a schema nested in itself becomes a plain object.
+def to_jsonschema(mschema, definitions=False):
+    cls = schema_class(mschema)
+    if definitions:
+        if cls not in _ref_jsonschemas:
+            _ref_jsonschemas[cls] = ref_jsonschema(cls)
+        return copy_json(_ref_jsonschemas[cls])
+    return copy_json(inline_jsonschema(cls, frozenset(), []))
+
+
+# Cached results are shared, callers get their own copy to modify.
+def copy_json(value):
+    if type(value) is dict:
+        return {k: copy_json(v) if type(v) in containers else v
+                for k, v in value.items()}
+    return [copy_json(v) if type(v) in containers else v for v in value]
+
+
+containers = (dict, list)
+
+
+def schema_class(mschema):
+    return mschema if isinstance(mschema, type) else mschema.__class__
+
+
+def convert_schema(cls, nested_schema):
+    def nested_field_schema(field):
+        return nested_schema(nested_class(cls, field))
     return reduce(
-        to_jsonschema_field,
-        mschema._declared_fields.items(),
+        partial(to_jsonschema_field, nested_schema=nested_field_schema),
+        cls._declared_fields.items(),
         {'type': 'object', 'properties': {}, 'required': []}
     )
 
 
-def to_jsonschema_field(current_schema, name_and_field):
+def inline_jsonschema(cls, in_progress, cuts):
+    if cls in _jsonschemas:
+        return _jsonschemas[cls]
+    if cls in in_progress:
+        cuts.append(cls)
+        return {'type': 'object'}
+    cuts_before = len(cuts)
+    schema = convert_schema(cls, partial(
+        inline_nested, in_progress | frozenset((cls,)), cuts
+    ))
+    # Only schemas that weren't cut short are the same in every context.
+    if len(cuts) == cuts_before:
+        _jsonschemas[cls] = schema
+    return schema
+
+
+def nested_class(owner, field):
+    if field.nested == 'self':
+        return owner
+    if isinstance(field.nested, string_types):
+        return class_registry.get_class(field.nested)
+    return schema_class(field.nested)
+
+
+def inline_nested(in_progress, cuts, cls):
+    return inline_jsonschema(cls, in_progress, cuts)
+
+
+def ref_jsonschema(cls):
+    definitions, names = {}, {}
+    schema = convert_schema(cls, partial(ref_nested, definitions, names))
+    if definitions:
+        schema['definitions'] = definitions
+    return schema
+
+
+def ref_nested(definitions, names, cls):
+    if cls not in names:
+        name = cls.__name__
+        while name in definitions:
+            name += '_'
+        names[cls] = name
+        definitions[name] = {}
+        definitions[name] = convert_schema(
+            cls, partial(ref_nested, definitions, names)
+        )
+    return {'$ref': '#/definitions/' + names[cls]}
+
+
+def converter_for(field_class):
+    try:
+        return _converters[field_class]
+    except KeyError:
+        converter = None
+        if field_class in type_mapping:
+            most_specific_mapped_class = find(
+                lambda c: c in property_mapping,
+                getmro(field_class)
+            )
+            converter = (
+                type_mapping[field_class],
+                property_mapping.get(most_specific_mapped_class),
+            )
+        _converters[field_class] = converter
+        return converter
+
+
+def to_jsonschema_field(current_schema, name_and_field, nested_schema=None):
     attr_name, field = name_and_field
-    if field.__class__ in type_mapping:
+    converter = converter_for(field.__class__)
+    if converter is not None:
         if field.name:
             name = field.name
         else:
             name = attr_name
         if field.required:
             current_schema['required'].append(name)
-        property_dict = {'type': type_mapping[field.__class__]}
-        most_specific_mapped_class = find(
-            lambda c: c in property_mapping.keys(),
-            getmro(field.__class__)
-        )
-        if most_specific_mapped_class:
-            property_dict.update(
-                property_mapping[most_specific_mapped_class](field)
-            )
+        json_type, convert = converter
+        property_dict = {'type': json_type}
+        if convert is not None:
+            if convert is nested and nested_schema is not None:
+                property_dict.update(nested_schema(field))
+            else:
+                property_dict.update(convert(field))
             current_schema['properties'].update({name: property_dict})
     return current_schema
 
@@ -10,11 +10,16 @@ setup(
         'sqlalchemy',
         'marshmallow',
         'marshmallow_sqlalchemy',
-        'networkx',
         'split',
         'six',
         'more_functools',
     ),
+    extras_require={
+        'async': ('flask[async]', 'sqlalchemy[asyncio]>=1.4'),
+        'brotli': ('brotli',),
+        'orjson': ('orjson',),
+        'validation': ('jsonschema',),
+    },
     dependency_links=(
         'https://github.com/purpleP/more_functools/tarball/master#egg=more_functools-1.0',
     ),
@@ -1,9 +1,9 @@
-import networkx as nx
 from itertools import chain
 from six.moves import zip, map, range
 from functools import partial
 from pytest import fixture
 from rest.helpers import tails, add_item
+from rest.hierarchy_traverser import ModelGraph
 from rest.handlers import serialize_item, create_schema
 from sqlalchemy import (
     Column,
@@ -205,7 +205,7 @@ def paths():
 
 @fixture()
 def hierarchy_graph():
-    g = nx.DiGraph()
+    g = ModelGraph()
     g.add_edge(Root, Level1, rel_attr='level1s', rel_type=ONETOMANY)
     g.add_edge(Level1, Level2, rel_attr='level2s', rel_type=ONETOMANY)
     g.add_edge(Level2, Level3, rel_attr='level3s', rel_type=ONETOMANY)
@@ -214,7 +214,7 @@ def hierarchy_graph():
 
 @fixture()
 def cyclic_graph():
-    g = nx.DiGraph()
+    g = ModelGraph()
     g.add_edge(Parent, Child, rel_attr='children', rel_type=MANYTOMANY)
     g.add_edge(Child, Parent, rel_attr='parents', rel_type=MANYTOMANY)
     g.add_edge(Child, Grandchild, rel_attr='grandchildren', rel_type=ONETOMANY)
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('asgiref')
+
+from flask import Flask
+from rest.asyncio_api import create_async_api
+from rest.endpoints import register_all_apis
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from tests.fixtures import Level1, ModelBase, Root, hierarchy_full_data
+from tests.flask_test_helpers import post_json, patch
+
+
+level1s_url = '/roots/root_1/level1s'
+
+
+# Flask runs every async view in its own event loop, so connections can't
+# be pooled between requests.
+def async_client(path):
+    url = 'sqlite:///{}'.format(path)
+    engine = create_engine(url)
+    ModelBase.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    hierarchy_full_data(session)
+    session.commit()
+    session_factory = sessionmaker(
+        create_async_engine('sqlite+aiosqlite:///{}'.format(path),
+                            poolclass=NullPool),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+    apis, schemas = create_async_api(Root, session_factory)
+    app = Flask(__name__)
+    register_all_apis(app, schemas, (apis,))
+    return session, app.test_client()
+
+
+def data(response):
+    return json.loads(response.data.decode('utf-8'))
+
+
+def level1_names(session):
+    session.expire_all()
+    return set(n for n, in session.query(Level1.name)
+               .filter(Level1.root_pk == 'root_1'))
+
+
+def test_async_api(tmpdir):
+    session, client = async_client(tmpdir.join('test.db'))
+    response = client.get('/roots')
+    assert response.status_code == 200
+    assert set(r['name'] for r in data(response)['items']) == {
+        'root_0', 'root_1'
+    }
+    response = client.get(level1s_url + '/root_1_level1_0')
+    assert response.status_code == 200
+    assert data(response)['name'] == 'root_1_level1_0'
+    response = client.get(level1s_url + '/no_such_level1')
+    assert response.status_code == 404
+
+    response = post_json(client, level1s_url, {'name': 'new'})
+    assert response.status_code == 200
+    assert data(response) == {'id': 'new'}
+    response = patch(client, level1s_url + '/new', {'name': 'newer'})
+    assert response.status_code == 200
+    response = client.delete(level1s_url + '/root_1_level1_0')
+    assert response.status_code == 200
+    assert level1_names(session) == {'newer', 'root_1_level1_1'}
@@ -0,0 +1,112 @@
+import json
+from functools import partial
+
+import pytest
+from flask import Flask
+from rest.cache import LocalCache, PickledCache, ResponseCache
+from rest.handlers import (
+    cached_handler,
+    create_handler,
+    create_schema,
+    delete_item,
+    get_handler,
+    get_collection,
+    invalidating_handler,
+    serialize_collection,
+)
+from tests.fixtures import (
+    Level1,
+    Level2,
+    Level3,
+    Root,
+    hierarchy_full_data,
+    level3_collection_rule,
+    level3_item_rule,
+    session,
+)
+from tests.test_handlers import l3_col_query, l3_query, make_url
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_local_cache_expires():
+    cache = LocalCache(ttl=-1)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+    cache.set('a', 1, ttl=0)
+    assert cache.get('a') == 1
+
+
+@pytest.mark.parametrize('backend', [LocalCache(), PickledCache()])
+def test_response_cache_invalidation(backend):
+    cache = ResponseCache(backend)
+    key = cache.key((Level3, Level2), '/level3s', [('page', '1')])
+    assert key == cache.key((Level3, Level2), '/level3s', [('page', '1')])
+    assert key != cache.key((Level3, Level2), '/level3s', [('page', '2')])
+    cache.invalidate((Level2,))
+    assert key != cache.key((Level3, Level2), '/level3s', [('page', '1')])
+
+
+def test_cached_handlers():
+    sess = session()
+    hierarchy_full_data(sess)
+    sess.commit()
+    cache = ResponseCache()
+    models = (Level3, Level2, Level1, Root)
+    app = Flask('foo')
+    app.add_url_rule(
+        rule=level3_collection_rule,
+        endpoint='collection',
+        view_func=get_handler(
+            cached_handler(
+                cache,
+                models,
+                partial(
+                    get_collection,
+                    sess,
+                    l3_col_query,
+                    partial(serialize_collection, create_schema(Level3)()),
+                )
+            )
+        ),
+        methods=['GET'],
+    )
+    app.add_url_rule(
+        rule=level3_item_rule,
+        endpoint='item',
+        view_func=create_handler(
+            invalidating_handler(
+                cache,
+                models,
+                partial(delete_item, sess, l3_query),
+            )
+        ),
+        methods=['DELETE'],
+    )
+    client = app.test_client()
+    names = ('roots', 'level1s', 'level2s', 'level3s')
+    url = make_url(names, ('root_1', 'level1_1', 'level2_1'))
+
+    def items():
+        return json.loads(client.get(url).data.decode('utf-8'))['items']
+
+    assert len(items()) == 2
+    sess.query(Level3).filter_by(
+        name='root_1_level1_1_level2_1_level3_1'
+    ).delete()
+    sess.commit()
+    assert len(items()) == 2
+    response = client.delete(
+        make_url(names, ('root_1', 'level1_1', 'level2_1', 'level3_0'))
+    )
+    assert response.status_code == 200
+    assert len(items()) == 0
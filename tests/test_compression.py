@@ -0,0 +1,79 @@
+import gzip
+import zlib
+
+import pytest
+from rest.compression import (
+    best_encoding,
+    compress,
+    compress_stream,
+    compressed_variants,
+    compressobjs,
+    compressors,
+    gzip_compress,
+)
+from werkzeug.datastructures import Accept
+
+
+def test_gzip_is_deterministic():
+    data = b'{"items": []}' * 100
+    assert gzip_compress(data) == gzip_compress(data)
+    assert gzip.decompress(gzip_compress(data)) == data
+
+
+def test_compressed_variants():
+    assert compressed_variants(b'{}') == {'identity': b'{}'}
+    variants = compressed_variants(b'{"items": []}' * 100)
+    assert set(variants) == set(compressors) | {'identity'}
+
+
+@pytest.mark.parametrize('accept,correct_encoding', [
+    ([], 'identity'),
+    ([('gzip', 1)], 'gzip'),
+    ([('gzip', 0.5), ('identity', 1)], 'identity'),
+    ([('identity', 1), ('gzip', 0.5)], 'identity'),
+    ([('deflate', 1)], 'identity'),
+    ([('*', 1)], 'gzip'),
+])
+def test_best_encoding(accept, correct_encoding):
+    available = {'identity': b'', 'gzip': b''}
+    assert best_encoding(available, Accept(accept)) == correct_encoding
+    assert best_encoding({'gzip': b''}, Accept(accept)) == correct_encoding
+
+
+decompressors = {
+    'gzip': gzip.decompress,
+    'deflate': zlib.decompress,
+}
+try:
+    import brotli
+    decompressors['br'] = brotli.decompress
+except ImportError:
+    pass
+
+
+@pytest.mark.parametrize('encoding', sorted(compressors))
+def test_compress(encoding):
+    data = b'{"items": []}' * 100
+    assert decompressors[encoding](compress(encoding, data)) == data
+    assert decompressors[encoding](
+        compress(encoding, data, {encoding: 1})
+    ) == data
+
+
+@pytest.mark.parametrize('encoding', sorted(compressobjs))
+def test_compress_stream(encoding):
+    closed = []
+
+    class Chunks(object):
+        def __iter__(self):
+            yield '{"items": ['
+            for i in range(100):
+                yield b'{"name": "item"},'
+            yield b']}'
+
+        def close(self):
+            closed.append(True)
+    body = b''.join(compress_stream(encoding, Chunks(), {encoding: 1}))
+    assert decompressors[encoding](body) == \
+        b'{"items": [' + b'{"name": "item"},' * 100 + b']}'
+    assert closed == [True]
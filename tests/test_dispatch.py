@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from flask import Flask
+from rest.dispatch import Dispatcher
+from rest.endpoints import create_api, register_all_apis
+from tests.fixtures import Root, session
+from tests.flask_test_helpers import post_json
+
+
+@pytest.fixture
+def dispatcher():
+    d = Dispatcher()
+    d.add('/roots', 'GET', 'roots')
+    d.add('/roots/<level_0_id>', 'GET', 'root')
+    d.add('/roots/<level_0_id>/level1s', 'GET', 'level1s')
+    d.add('/roots/<level_0_id>/level1s/<int:level_1_id>', 'GET', 'level1')
+    d.add('/roots/new', 'GET', 'new_root')
+    return d
+
+
+@pytest.mark.parametrize('path,handler,kwargs', [
+    ('/roots', 'roots', {}),
+    ('/roots/a', 'root', {'level_0_id': 'a'}),
+    ('/roots/new', 'new_root', {}),
+    ('/roots/a/level1s', 'level1s', {'level_0_id': 'a'}),
+    ('/roots/a/level1s/1', 'level1', {'level_0_id': 'a', 'level_1_id': 1}),
+    ('/roots/a/level1s/b', None, None),
+    ('/roots/', None, None),
+    ('/roots/a/level2s', None, None),
+])
+def test_match(dispatcher, path, handler, kwargs):
+    handlers, match_kwargs = dispatcher.match(path)
+    assert (handlers and handlers['GET']) == handler
+    assert match_kwargs == kwargs
+
+
+def test_duplicate_rule(dispatcher):
+    with pytest.raises(ValueError):
+        dispatcher.add('/roots/<level_0_id>', 'GET', 'root')
+
+
+def test_dispatched_api():
+    apis, schemas = create_api(Root, session())
+    app = Flask(__name__)
+    register_all_apis(app, schemas, (apis,), dispatcher=True)
+    client = app.test_client()
+    assert len(list(app.url_map.iter_rules())) == 3
+    response = post_json(client, '/roots', {'name': 'a'})
+    assert response.status_code == 200
+    response = client.get('/roots/a')
+    assert response.status_code == 200
+    assert json.loads(response.data.decode('utf-8'))['name'] == 'a'
+    assert client.get('/roots/a/level1s').status_code == 200
+    assert client.get('/roots/b').status_code == 404
+    assert client.get('/nothing').status_code == 404
+    assert client.post('/roots/a').status_code == 405
+    assert client.get('/schemas').status_code == 200
@@ -0,0 +1,95 @@
+import json
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from flask import Flask
+from rest.encoders import default, encoders
+from rest.endpoints import create_api, register_all_apis
+from tests.fixtures import Root, session
+from tests.flask_test_helpers import post_json
+
+VALUES = {
+    'datetime': datetime(2017, 1, 2, 3, 4, 5),
+    'date': date(2017, 1, 2),
+    'time': time(3, 4, 5),
+    'decimal': Decimal('1.10'),
+    'uuid': UUID(int=1),
+    'name': u'да',
+    'items': [1, 2.5, None, True],
+}
+ENCODED = {
+    'datetime': '2017-01-02T03:04:05',
+    'date': '2017-01-02',
+    'time': '03:04:05',
+    'decimal': '1.10',
+    'uuid': '00000000-0000-0000-0000-000000000001',
+    'name': u'да',
+    'items': [1, 2.5, None, True],
+}
+
+
+@pytest.mark.parametrize('name', sorted(encoders))
+def test_encoders(name):
+    body = encoders[name](VALUES)
+    assert isinstance(body, bytes)
+    assert json.loads(body.decode('utf-8')) == ENCODED
+
+
+def test_unknown_type():
+    with pytest.raises(TypeError):
+        default(object())
+
+
+@pytest.mark.parametrize('stream_chunk_size', [None, 1])
+def test_api_encoder(stream_chunk_size):
+    encoded = []
+
+    def encoder(data):
+        encoded.append(data)
+        return json.dumps(data).encode('utf-8')
+
+    def config_decorator(config):
+        config[Root]['stream_chunk_size'] = stream_chunk_size
+        return config
+    apis, schemas = create_api(
+        Root, session(), config_decorator=config_decorator
+    )
+    app = Flask(__name__)
+    register_all_apis(app, schemas, (apis,), encoder=encoder)
+    client = app.test_client()
+    assert post_json(client, '/roots', {'name': 'a'}).status_code == 200
+    assert encoded == [{'id': 'a'}]
+    response = client.get('/roots')
+    assert json.loads(response.data.decode('utf-8')) == \
+        {'items': [{'name': 'a', 'level1s': []}]}
+    assert encoded[-1] in (
+        {'name': 'a', 'level1s': []},
+        {'items': [{'name': 'a', 'level1s': []}]},
+    )
+
+
+@pytest.mark.parametrize('validate_body', [True, False])
+def test_errors_use_api_encoder(validate_body):
+    encoded = []
+
+    def encoder(data):
+        encoded.append(data)
+        return json.dumps(data).encode('utf-8')
+
+    def config_decorator(config):
+        config[Root]['validate_body'] = validate_body
+        return config
+    apis, schemas = create_api(
+        Root, session(), config_decorator=config_decorator
+    )
+    app = Flask(__name__)
+    register_all_apis(app, schemas, (apis,), encoder=encoder)
+    client = app.test_client()
+    response = post_json(client, '/roots', {'name': 1})
+    assert response.status_code == 400
+    assert response.mimetype == 'application/json'
+    assert list(encoded[-1]) == ['name']
+    assert json.loads(response.data.decode('utf-8')) == encoded[-1]
@@ -1,4 +1,7 @@
+import gzip
+import io
 import json
+import zlib
 
 from flask import Flask
 from functools import reduce
@@ -12,12 +15,18 @@ from rest.endpoints import (
     schemas_for_paths,
     url_rules_for_path,
 )
+from rest.hierarchy_traverser import create_graph as original_create_graph
 from rest.helpers import merge, compose, identity, find
 from rest.handlers import (
     create_schema,
     NO_SUCH_RESOURCE_MESSAGE,
     NO_SUCH_ITEM_MESSAGE,
 )
+from rest.decoding import (
+    BODY_TOO_LARGE_MESSAGE,
+    INVALID_JSON_MESSAGE,
+    UNSUPPORTED_MEDIA_TYPE_MESSAGE,
+)
 from rest.decorators import without_relations
 from rest.generators import object_
 from rest.schema import to_jsonschema
@@ -364,3 +373,240 @@ def test_url_for_path(session, cyclic_graph):
     correct_item_url_rule = correct_collection_url_rule + '/<level_2_id>'
     assert collection_url_rule == correct_collection_url_rule
     assert item_url_rule == correct_item_url_rule
+
+
+def registered_rules(apis):
+    return set(
+        (rule, method)
+        for endpoints in apis.values()
+        for eps in endpoints
+        for methods in eps.values()
+        for method, (rule, handler) in iteritems(methods)
+    )
+
+
+def test_lazy_api(session):
+    eager, _ = create_api(Root, session)
+    lazy, schemas = create_api(Root, session, lazy=True)
+    assert registered_rules(lazy) == registered_rules(eager)
+    flask_app = app()
+    register_all_apis(flask_app, schemas, (lazy,))
+    client = flask_app.test_client()
+    check_empty_collection(client, '/roots')
+    assert check_post_and_return_id(client, '/roots', {'name': 'a'}) == 'a'
+
+
+def test_graph_cache(session, tmpdir, monkeypatch):
+    cache_file = str(tmpdir.join('graph.pickle'))
+    apis, schemas = create_api(Root, session, graph_cache=cache_file)
+
+    def create_graph(root_model):
+        raise AssertionError('graph should be loaded from the cache')
+    monkeypatch.setattr('rest.endpoints.create_graph', create_graph)
+    cached_apis, cached_schemas = create_api(
+        Root, session, graph_cache=cache_file
+    )
+    assert registered_rules(cached_apis) == registered_rules(apis)
+    assert cached_schemas == schemas
+
+
+def test_graph_cache_fingerprint(session, tmpdir, monkeypatch):
+    cache_file = str(tmpdir.join('graph.pickle'))
+    create_api(Root, session, graph_cache=cache_file)
+    built = []
+
+    def create_graph(root_model):
+        built.append(root_model)
+        return original_create_graph(root_model)
+    monkeypatch.setattr('rest.endpoints.create_graph', create_graph)
+    apis, schemas = create_api(
+        Root, session, graph_cache=cache_file, max_depth=0
+    )
+    assert built == [Root]
+    assert set(rule for rule, method in registered_rules(apis)) == {
+        '/roots', '/roots/<level_0_id>'
+    }
+    create_api(Root, session, graph_cache=cache_file, max_depth=0)
+    assert built == [Root]
+
+    def any_edge(parent, child, edge_data):
+        return True
+    create_api(
+        Root, session, graph_cache=cache_file, max_depth=0,
+        edge_filter=any_edge,
+    )
+    assert built == [Root, Root]
+
+
+def test_schema_classes_are_shared():
+    assert create_schema(Root) is create_schema(Root)
+    assert create_schema(Root, {'exclude': ('level1s',)}) is not \
+        create_schema(Root)
+
+
+def test_path_limits(session):
+    apis, schemas = create_api(Root, session, max_depth=0)
+    assert set(rule for rule, method in registered_rules(apis)) == {
+        '/roots', '/roots/<level_0_id>'
+    }
+
+
+def test_schemas_endpoint(session):
+    apis, schemas = create_api(Root, session)
+    flask_app = app()
+    register_all_apis(flask_app, schemas, (apis,), schema_per_model=True)
+    client = flask_app.test_client()
+    response = client.get('/schemas', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.cache_control.max_age == 24 * 60 * 60
+    data = json.loads(gzip.decompress(response.data).decode('utf-8'))
+    assert set(data) == set(str(m) for m in schemas)
+    etag = response.headers['ETag']
+    response = client.get('/schemas', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': etag,
+    })
+    assert response.status_code == 304
+    # The uncompressed body is a different representation.
+    response = client.get('/schemas', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert set(json.loads(response.data.decode('utf-8'))) == set(data)
+    assert response.headers['ETag'] != etag
+    identity_etag = response.headers['ETag']
+    response = client.get('/schemas', headers={
+        'If-None-Match': identity_etag,
+    })
+    assert response.status_code == 304
+    response = client.get('/schemas/Root')
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data.decode('utf-8'))['properties'] == \
+        schemas[Root]['properties']
+    assert response.headers['ETag'] != etag
+    assert client.get('/schemas/Nothing').status_code == 404
+
+
+def limit_root_bodies(config):
+    config[Root]['max_body_size'] = 64
+    return config
+
+
+@pytest.mark.parametrize('method,url,body,content_type,status,error', [
+    ('post', '/roots', {'name': 1}, 'application/json', 400, 'name'),
+    ('post', '/roots', {}, 'application/json', 400, '_schema'),
+    ('post', '/roots', [{'name': 'a'}, {'name': 1}], 'application/json',
+     400, '1.name'),
+    ('post', '/roots', '{"name":', 'application/json', 400,
+     INVALID_JSON_MESSAGE),
+    ('post', '/roots', {'name': 'a'}, 'text/plain', 415,
+     UNSUPPORTED_MEDIA_TYPE_MESSAGE),
+    ('post', '/roots', {'name': 'a' * 64}, 'application/json', 413,
+     BODY_TOO_LARGE_MESSAGE.format(64)),
+    ('patch', '/roots/root_1', {'name': 1}, 'application/json', 400,
+     'name'),
+])
+def test_rejected_bodies(method, url, body, content_type, status, error):
+    apis, schemas = create_api(
+        Root, session(), config_decorator=limit_root_bodies
+    )
+    flask_app = app()
+    register_all_apis(flask_app, schemas, (apis,))
+    client = flask_app.test_client()
+    response = getattr(client, method)(
+        url,
+        data=body if isinstance(body, str) else json.dumps(body),
+        content_type=content_type,
+    )
+    assert response.status_code == status
+    assert error in response.data.decode('utf-8')
+    check_empty_collection(client, '/roots')
+
+
+def test_accepted_bodies(session):
+    apis, schemas = create_api(
+        Root, session, config_decorator=limit_root_bodies
+    )
+    flask_app = app()
+    register_all_apis(flask_app, schemas, (apis,))
+    client = flask_app.test_client()
+    assert check_post_and_return_id(client, '/roots', {'name': 'a'}) == 'a'
+    response = client.patch(
+        '/roots/a', data=json.dumps({}), content_type='application/json'
+    )
+    assert response.status_code == 200
+    response = client.post('/roots', data=json.dumps({'name': 'b'}))
+    assert response.status_code == 415
+    response = client.post(
+        '/roots',
+        data=json.dumps({'name': 'b'}),
+        content_type='application/vnd.api+json',
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('max_body_size', [None, 64])
+@pytest.mark.parametrize('content_type,status', [
+    ('text/plain', 415),
+    ('application/json', 200),
+])
+def test_chunked_bodies(max_body_size, content_type, status):
+    def config_decorator(cfg):
+        cfg[Root]['max_body_size'] = max_body_size
+        return cfg
+    apis, schemas = create_api(
+        Root, session(), config_decorator=config_decorator
+    )
+    flask_app = app()
+    register_all_apis(flask_app, schemas, (apis,))
+    client = flask_app.test_client()
+    response = client.post(
+        '/roots',
+        input_stream=io.BytesIO(json.dumps({'name': 'a'}).encode('utf-8')),
+        content_type=content_type,
+        headers={'Transfer-Encoding': 'chunked'},
+        environ_overrides={'wsgi.input_terminated': True},
+    )
+    assert response.status_code == status
+    if status == 415:
+        check_empty_collection(client, '/roots')
+
+
+@pytest.mark.parametrize('config,accept,count,encoding', [
+    ({}, 'gzip', 100, 'gzip'),
+    ({}, 'deflate', 100, 'deflate'),
+    ({}, 'gzip;q=0', 100, None),
+    ({}, 'identity;q=1, gzip;q=0.5', 100, None),
+    ({}, 'gzip', 1, None),
+    ({'compress_min_size': 0}, 'gzip', 1, 'gzip'),
+    ({'compress_levels': {'gzip': 1}}, 'gzip', 100, 'gzip'),
+    ({'stream_chunk_size': 10}, 'gzip', 1, 'gzip'),
+    ({'compress': False}, 'gzip', 100, None),
+])
+def test_compressed_responses(config, accept, count, encoding):
+    def config_decorator(cfg):
+        cfg[Root].update(config)
+        return cfg
+    apis, schemas = create_api(
+        Root, session(), config_decorator=config_decorator
+    )
+    flask_app = app()
+    register_all_apis(flask_app, schemas, (apis,))
+    client = flask_app.test_client()
+    post_json(client, '/roots', [{'name': str(i)} for i in range(count)])
+    response = client.get('/roots', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == encoding
+    data = response.data
+    if encoding == 'gzip':
+        data = gzip.decompress(data)
+    elif encoding == 'deflate':
+        data = zlib.decompress(data)
+    assert len(json.loads(data.decode('utf-8'))['items']) == count
+    if 'compress' not in config:
+        assert 'Accept-Encoding' in response.vary
+    etag = response.headers.get('ETag')
+    if etag is not None:
+        response = client.get('/roots', headers={
+            'Accept-Encoding': accept, 'If-None-Match': etag,
+        })
+        assert response.status_code == 304
@@ -1,37 +1,72 @@
+import decimal
 import json
 from collections import namedtuple
+from datetime import datetime
 from functools import partial
 from itertools import chain
 from six.moves import zip
 
 import pytest
-from flask import Flask
+from flask import Flask, request
+from itsdangerous import BadSignature
+from marshmallow.fields import DateTime, Decimal, Integer
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import scoped_session, sessionmaker
 from rest.handlers import (
+    collection_data_handler,
+    conditional_handler,
     create_handler,
     create_schema,
+    delete_collection,
     delete_item,
     delete_many_to_many,
     get_collection,
     get_handler,
     data_handler,
+    decode_cursor,
+    encode_cursor,
     get_item,
+    get_item_handler,
+    key_names,
+    keys_from_kwargs,
+    link_many_to_many,
     post_item,
+    patch_collection,
     patch_item,
     post_item_many_to_many,
     root_adder,
+    root_bulk_adder,
     non_root_adder,
+    non_root_bulk_adder,
     serialize_collection,
     deserialize_item,
     serialize_item,
+    session_handler,
+    unlink_many_to_many,
+    update_item,
+    validate_item,
+    INVALID_CURSOR_MESSAGE,
+    INVALID_VALUES_MESSAGE,
+    NOT_AN_OBJECT_MESSAGE,
+    NO_CURSOR_SECRET_MESSAGE,
+    INVALID_PAGE_MESSAGE,
+    INVALID_SPEC_MESSAGE,
+    INVALID_IDS_MESSAGE,
+    INVALID_LINKS_MESSAGE,
+    UNKNOWN_FIELDS_MESSAGE,
+    NO_ROWS_SELECTED_MESSAGE,
     NO_SUCH_ITEM_MESSAGE,
     NO_SUCH_PARENT_MESSAGE,
     NO_SUCH_RESOURCE_MESSAGE,
+    NO_SUCH_SPEC_MESSAGE,
 )
 from tests.flask_test_helpers import post_json, patch
 from rest.helpers import inits
-from rest.query import query
+from rest.query import cached_count, no_count, query
+from rest.row_serializer import row_serializer
 from tests.fixtures import (
     Child,
+    Grandchild,
     Level1,
     Level2,
     Level3,
@@ -58,6 +93,7 @@ def client(params, session_modifier):
     sess.commit()
     app = Flask('foo')
     app.debug = True
+    app.secret_key = 'secret'
     app.add_url_rule(
         rule=params[0],
         endpoint='1',
@@ -123,6 +159,32 @@ def root_post_item_handler_maker(session):
     )
 
 
+def root_bulk_post_item_handler_maker(session):
+    return data_handler(
+        partial(
+            post_item,
+            session,
+            'name',
+            root_adder,
+            partial(deserialize_item, create_schema(Root)(), session),
+            bulk_adder=root_bulk_adder,
+        )
+    )
+
+
+def l3_bulk_post_item_handler_maker(session):
+    return data_handler(
+        partial(
+            post_item,
+            session,
+            'name',
+            partial(non_root_adder, l2_item_query, 'level3s'),
+            partial(deserialize_item, create_schema(Level3)(), session),
+            bulk_adder=partial(non_root_bulk_adder, l2_item_query, 'level3s'),
+        )
+    )
+
+
 def post_state_checker(state, model, name_):
     assert state.session.query(model).filter_by(name=name_).count() == 1
 
@@ -214,6 +276,18 @@ l3_collection_params = (
 )
 
 
+def l3_keyset_handler_maker(serializer, session):
+    return get_handler(
+        partial(
+            get_collection,
+            session,
+            l3_col_query,
+            serializer,
+            cursor_attrs=(Level3.name,),
+        ),
+    )
+
+
 def l3_item_handler_maker(session):
     return create_handler(
         partial(
@@ -311,6 +385,10 @@ def delete(client, url, *args, **kwargs):
     return client.delete(url, *args, **kwargs)
 
 
+def patch_req(client, url, *args, **kwargs):
+    return client.patch(url, *args, **kwargs)
+
+
 def check_if_deleted(state, _id):
     assert state.session \
                .query(Level3) \
@@ -548,6 +626,846 @@ def test_handler(state, req, status_code, response_checker, state_checker):
     if state_checker is not None:
         state_checker(state=state)
 
+
+@pytest.mark.parametrize('serializer', [
+    partial(serialize_collection, create_schema(Level3)()),
+    row_serializer(Level3, create_schema(Level3)(), many=True),
+])
+def test_keyset_pagination(serializer):
+    state = client(
+        (
+            level3_collection_rule,
+            partial(l3_keyset_handler_maker, serializer),
+            ['GET'],
+        ),
+        hierarchy_full_data
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    names = []
+    after = ''
+    while after is not None:
+        response = get(
+            state.client,
+            url,
+            query_string={'after': after, 'size': 1}
+        )
+        assert response.status_code == 200
+        data = json.loads(response.data.decode('utf-8'))
+        assert data['count'] == len(data['items']) == 1
+        names.extend(i['name'] for i in data['items'])
+        after = data['next']
+    assert names == [
+        'root_1_level1_1_level2_1_level3_0',
+        'root_1_level1_1_level2_1_level3_1',
+    ]
+    response = get(state.client, url, query_string={'after': 'x', 'size': 1})
+    assert response.status_code == 400
+    raw_response_checker(response, INVALID_CURSOR_MESSAGE)
+
+
+@pytest.mark.parametrize('cursor_secret,status_code', [
+    (None, 400),
+    ('cursor secret', 200),
+])
+def test_cursor_secret(cursor_secret, status_code):
+    sess = session()
+    hierarchy_full_data(sess)
+    sess.commit()
+    app = Flask('foo')
+    app.add_url_rule(
+        level3_collection_rule,
+        view_func=get_handler(partial(
+            get_collection,
+            sess,
+            l3_col_query,
+            partial(serialize_collection, create_schema(Level3)()),
+            cursor_attrs=(Level3.name,),
+            cursor_secret=cursor_secret,
+        )),
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = get(app.test_client(), url,
+                   query_string={'after': '', 'size': 1})
+    assert response.status_code == status_code
+    if status_code == 400:
+        raw_response_checker(response, NO_CURSOR_SECRET_MESSAGE)
+    else:
+        after = json.loads(response.data.decode('utf-8'))['next']
+        assert decode_cursor(after, 1, secret=cursor_secret) == \
+            ['root_1_level1_1_level2_1_level3_0']
+
+
+def test_cursor_values():
+    fields = (DateTime(), Decimal(), Integer())
+    values = [datetime(2017, 1, 2, 3, 4, 5), decimal.Decimal('1.10'), 3]
+    token = encode_cursor(values, fields, 'secret')
+    assert decode_cursor(token, 3, fields, 'secret') == values
+    with pytest.raises(BadSignature):
+        decode_cursor(token, 2, fields, 'secret')
+    with pytest.raises(BadSignature):
+        decode_cursor(token, 3, fields, 'other secret')
+
+
+def l3_counted_handler_maker(counter, session):
+    return get_handler(
+        partial(
+            get_collection,
+            session,
+            l3_col_query,
+            partial(serialize_collection, create_schema(Level3)()),
+            counter=counter,
+        ),
+    )
+
+
+@pytest.mark.parametrize('counter,page,correct_data', [
+    (no_count, 1, {'count': 1, 'has_more': True}),
+    (no_count, 2, {'count': 1, 'has_more': False}),
+    (cached_count(60), 2, {'count': 1, 'total': 2}),
+])
+def test_count_modes(counter, page, correct_data):
+    state = client(
+        (
+            level3_collection_rule,
+            partial(l3_counted_handler_maker, counter),
+            ['GET'],
+        ),
+        hierarchy_full_data
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = get(state.client, url, query_string={'page': page, 'size': 1})
+    assert response.status_code == 200
+    data = json.loads(response.data.decode('utf-8'))
+    del data['items']
+    assert data == correct_data
+
+
+def test_stream_collection():
+    state = client(
+        (
+            level3_collection_rule,
+            lambda s: get_handler(
+                partial(
+                    get_collection,
+                    s,
+                    l3_col_query,
+                    partial(serialize_collection, create_schema(Level3)()),
+                    stream_chunk_size=1,
+                )
+            ),
+            ['GET'],
+        ),
+        hierarchy_full_data
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = get(state.client, url)
+    assert response.status_code == 200
+    assert response.is_streamed
+    dict_response_checker(
+        response,
+        {
+            'items': [
+                {'name': 'root_1_level1_1_level2_1_level3_0'},
+                {'name': 'root_1_level1_1_level2_1_level3_1'},
+            ]
+        }
+    )
+
+
+def test_session_handler():
+    sess = session()
+    hierarchy_full_data(sess)
+    sess.commit()
+    db_session = scoped_session(sessionmaker(bind=sess.get_bind()))
+    sessions = []
+
+    def handler(*keys):
+        sessions.append(db_session())
+        return get_item(db_session, l3_query, lambda item: {}, *keys)
+
+    app = Flask('foo')
+    app.add_url_rule(
+        rule=level3_item_rule,
+        endpoint='1',
+        view_func=create_handler(session_handler(db_session, handler)),
+        methods=['GET']
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1', 'level3_0')
+    )
+    for _ in range(2):
+        response = app.test_client().get(url)
+        assert response.status_code == 200
+        response.close()
+    assert sessions[0] is not sessions[1]
+
+
+@pytest.mark.parametrize('fields,status_code,correct_data', [
+    (
+        'level2_pk',
+        200,
+        {
+            'items': [
+                {'level2_pk': 'root_1_level1_1_level2_1'},
+                {'level2_pk': 'root_1_level1_1_level2_1'},
+            ]
+        }
+    ),
+    ('name,bogus', 400, UNKNOWN_FIELDS_MESSAGE.format('bogus')),
+])
+def test_sparse_fields(fields, status_code, correct_data):
+    state = client(l3_collection_params, hierarchy_full_data)
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = get(state.client, url, query_string={'fields': fields})
+    assert response.status_code == status_code
+    if status_code == 200:
+        dict_response_checker(response, correct_data)
+    else:
+        raw_response_checker(response, correct_data)
+
+
+def l3_conditional_collection_handler_maker(session):
+    return get_handler(
+        conditional_handler(
+            partial(
+                get_collection,
+                session,
+                l3_col_query,
+                partial(serialize_collection, create_schema(Level3)()),
+            )
+        )
+    )
+
+
+def l3_conditional_item_handler_maker(session):
+    return get_item_handler(
+        conditional_handler(
+            partial(
+                get_item,
+                session,
+                l3_query,
+                partial(serialize_item, create_schema(Level3)()),
+                version_attr=Level3.name,
+            )
+        )
+    )
+
+
+@pytest.mark.parametrize('params,url', [
+    (
+        (
+            level3_collection_rule,
+            l3_conditional_collection_handler_maker,
+            ['GET'],
+        ),
+        make_url(
+            collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+            item_names=('root_1', 'level1_1', 'level2_1')
+        ),
+    ),
+    (
+        (
+            level3_item_rule,
+            l3_conditional_item_handler_maker,
+            ['GET'],
+        ),
+        make_url(
+            collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+            item_names=('root_1', 'level1_1', 'level2_1', 'level3_0')
+        ),
+    ),
+])
+def test_conditional_get(params, url):
+    state = client(params, hierarchy_full_data)
+    response = get(state.client, url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    response = get(state.client, url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    response = get(state.client, url, headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+
+def bulk_post_state_checker(state, model, names):
+    assert state.session.query(model) \
+               .filter(model.name.in_(names)) \
+               .count() == len(names)
+
+
+@pytest.mark.parametrize('params,model,url,data,status_code,correct_data', [
+    (
+        ('/roots', root_bulk_post_item_handler_maker, ['POST']),
+        Root,
+        '/roots',
+        [{'name': 'root_2'}, {'name': 'root_3'}],
+        200,
+        {'ids': ['root_2', 'root_3']},
+    ),
+    (
+        ('/roots', root_bulk_post_item_handler_maker, ['POST']),
+        Root,
+        '/roots',
+        [{'name': 'root_2'}, {}],
+        400,
+        None,
+    ),
+    (
+        (level3_collection_rule, l3_bulk_post_item_handler_maker, ['POST']),
+        Level3,
+        make_url(
+            collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+            item_names=('root_1', 'level1_1', 'level2_1')
+        ),
+        [{'name': 'l3_a'}, {'name': 'l3_b'}],
+        200,
+        {'ids': ['l3_a', 'l3_b']},
+    ),
+    (
+        (level3_collection_rule, l3_bulk_post_item_handler_maker, ['POST']),
+        Level3,
+        make_url(
+            collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+            item_names=('root_1', 'level1_1', 'level2_2')
+        ),
+        [{'name': 'l3_a'}],
+        404,
+        None,
+    ),
+])
+def test_bulk_post(params, model, url, data, status_code, correct_data):
+    state = client(params, hierarchy_full_data)
+    response = post_json(state.client, url, data)
+    assert response.status_code == status_code
+    names = [d['name'] for d in data if 'name' in d]
+    if correct_data is not None:
+        dict_response_checker(response, correct_data)
+        bulk_post_state_checker(state, model, names)
+    else:
+        assert state.session.query(model) \
+                   .filter(model.name.in_(names)).count() == 0
+    if status_code == 400:
+        assert list(json.loads(response.data.decode('utf-8'))) == ['1']
+
+
+def executed_statements(session):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(session.get_bind(), 'before_cursor_execute', record)
+    return statements
+
+
+def test_bulk_post_statements():
+    state = client(
+        ('/roots', root_bulk_post_item_handler_maker, ['POST']),
+        hierarchy_full_data,
+    )
+    statements = executed_statements(state.session)
+    names = ['root_{}'.format(i) for i in range(2, 12)]
+    response = post_json(state.client, '/roots',
+                         [{'name': n} for n in names])
+    dict_response_checker(response, {'ids': names})
+    # The ids come from the flushed items, nothing is reloaded after the
+    # INSERT. The SELECTs before it are the schema looking up instances.
+    inserts = [i for i, s in enumerate(statements) if s.startswith('INSERT')]
+    assert inserts == [len(statements) - 1]
+
+
+def l3_by_name_spec(name, query):
+    return query.filter(Level3.name == name)
+
+
+def l3_bulk_handler_maker(handler, session):
+    return collection_data_handler(
+        partial(handler, session, l3_col_query, Level3.name),
+        {'by_name': l3_by_name_spec},
+    )
+
+
+def level3_names(state):
+    return set(n for n, in state.session.query(Level3.name)
+               .filter(Level3.level2_pk == 'root_1_level1_1_level2_1'))
+
+
+@pytest.mark.parametrize('handler,req,status_code,correct_names', [
+    (
+        patch_collection,
+        partial(
+            patch,
+            data={
+                'ids': ['root_1_level1_1_level2_1_level3_0'],
+                'data': {'name': 'new_name'},
+            },
+        ),
+        200,
+        {'new_name', 'root_1_level1_1_level2_1_level3_1'},
+    ),
+    (
+        delete_collection,
+        partial(
+            delete,
+            data=json.dumps({'ids': ['root_1_level1_1_level2_1_level3_0']}),
+            content_type='application/json',
+        ),
+        200,
+        {'root_1_level1_1_level2_1_level3_1'},
+    ),
+    (
+        delete_collection,
+        partial(
+            delete,
+            query_string=search_dict('root_1_level1_1_level2_1_level3_1'),
+        ),
+        200,
+        {'root_1_level1_1_level2_1_level3_0'},
+    ),
+    (
+        delete_collection,
+        delete,
+        400,
+        {
+            'root_1_level1_1_level2_1_level3_0',
+            'root_1_level1_1_level2_1_level3_1',
+        },
+    ),
+])
+def test_bulk_patch_and_delete(handler, req, status_code, correct_names):
+    state = client(
+        (
+            level3_collection_rule,
+            partial(l3_bulk_handler_maker, handler),
+            ['PATCH', 'DELETE'],
+        ),
+        hierarchy_full_data,
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = req(state.client, url=url)
+    assert response.status_code == status_code
+    if status_code == 200:
+        dict_response_checker(response, {'count': 1})
+    else:
+        raw_response_checker(response, NO_ROWS_SELECTED_MESSAGE)
+    assert level3_names(state) == correct_names
+
+
+def json_body(req, body):
+    return partial(req, data=json.dumps(body),
+                   content_type='application/json')
+
+
+@pytest.mark.parametrize('handler,req,correct_data', [
+    (patch_collection, json_body(patch_req, [1]), NOT_AN_OBJECT_MESSAGE),
+    (delete_collection, json_body(delete, [1]), NOT_AN_OBJECT_MESSAGE),
+    (
+        patch_collection,
+        json_body(patch_req, {'ids': 5, 'data': {'name': 'a'}}),
+        INVALID_IDS_MESSAGE,
+    ),
+    (delete_collection, json_body(delete, {'ids': 5}), INVALID_IDS_MESSAGE),
+    (
+        patch_collection,
+        json_body(patch_req, {'ids': ['a'], 'data': [1, 2]}),
+        INVALID_VALUES_MESSAGE,
+    ),
+    (
+        patch_collection,
+        json_body(patch_req, {'ids': ['a'], 'data': {}}),
+        INVALID_VALUES_MESSAGE,
+    ),
+    (
+        patch_collection,
+        json_body(patch_req, {'ids': ['a']}),
+        INVALID_VALUES_MESSAGE,
+    ),
+])
+def test_invalid_bulk_bodies(handler, req, correct_data):
+    state = client(
+        (
+            level3_collection_rule,
+            partial(l3_bulk_handler_maker, handler),
+            ['PATCH', 'DELETE'],
+        ),
+        hierarchy_full_data,
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = req(state.client, url)
+    assert response.status_code == 400
+    raw_response_checker(response, correct_data)
+    assert level3_names(state) == {
+        'root_1_level1_1_level2_1_level3_0',
+        'root_1_level1_1_level2_1_level3_1',
+    }
+
+
+grandchildren_query = partial(
+    query,
+    model_to_query=Grandchild,
+    join_attrs=(Child,),
+    attrs_to_filter=(Child.id,),
+)
+
+
+# Grandchildren are exposed by name, which is only unique per child.
+def same_named_grandchildren(session):
+    session.add_all((
+        Child(id=1, name='child_1',
+              grandchildren=[Grandchild(name='a'), Grandchild(name='b')]),
+        Child(id=2, name='child_2', grandchildren=[Grandchild(name='a')]),
+    ))
+
+
+def grandchildren_bulk_handler_maker(handler, session):
+    return collection_data_handler(
+        partial(handler, session, grandchildren_query, Grandchild.name)
+    )
+
+
+def grandchild_names(state):
+    return set(state.session.query(Child.id, Grandchild.name).join(Child))
+
+
+@pytest.mark.parametrize('handler,req,correct_names', [
+    (
+        patch_collection,
+        partial(patch, data={'ids': ['a'], 'data': {'name': 'c'}}),
+        {(1, 'c'), (1, 'b'), (2, 'a')},
+    ),
+    (
+        delete_collection,
+        partial(
+            delete,
+            data=json.dumps({'ids': ['a']}),
+            content_type='application/json',
+        ),
+        {(1, 'b'), (2, 'a')},
+    ),
+])
+def test_bulk_patch_and_delete_within_parent(handler, req, correct_names):
+    state = client(
+        (
+            '/children/<level_0_id>/grandchildren',
+            partial(grandchildren_bulk_handler_maker, handler),
+            ['PATCH', 'DELETE'],
+        ),
+        same_named_grandchildren,
+    )
+    response = req(state.client, url='/children/1/grandchildren')
+    assert response.status_code == 200
+    dict_response_checker(response, {'count': 1})
+    assert grandchild_names(state) == correct_names
+
+
+def bulk_many_to_many_handler_maker(session):
+    args = (
+        session,
+        parent_query,
+        inspect(Parent).relationships['children'],
+        Child.name,
+    )
+    h = data_handler(partial(
+        post_item_many_to_many,
+        session,
+        child_query,
+        parent_query,
+        'children',
+        bulk_linker=partial(link_many_to_many, *args),
+    ))
+    del_h = collection_data_handler(partial(unlink_many_to_many, *args))
+
+    def dispatch(*args, **kwargs):
+        return (h if request.method == 'POST' else del_h)(*args, **kwargs)
+    return dispatch
+
+
+def linked_children(state, parent_name):
+    return set(
+        n for n, in state.session.query(Child.name)
+        .join(Child, Parent.children)
+        .filter(Parent.name == parent_name)
+    )
+
+
+def test_bulk_link_and_unlink():
+    state = client(
+        (
+            '/parents/<level_0_id>/children',
+            bulk_many_to_many_handler_maker,
+            ['POST', 'DELETE'],
+        ),
+        circular_full_data,
+    )
+    url = '/parents/pseudoroot_1_parent_1/children'
+    ids = [{'id': 'pseudoroot_1_child_0'}, {'id': 'pseudoroot_1_child_1'}]
+    response = post_json(state.client, url, data=ids)
+    assert response.status_code == 200
+    # pseudoroot_1_child_1 is already linked
+    dict_response_checker(response, {'count': 1})
+    response = post_json(state.client, url, data=ids)
+    dict_response_checker(response, {'count': 0})
+    assert linked_children(state, 'pseudoroot_1_parent_1') == {
+        'pseudoroot_1_child_0', 'pseudoroot_1_child_1'
+    }
+    assert linked_children(state, 'pseudoroot_1_parent_0') == {
+        'pseudoroot_1_child_0'
+    }
+
+    response = delete(
+        state.client,
+        url,
+        data=json.dumps({'ids': ['pseudoroot_1_child_0']}),
+        content_type='application/json',
+    )
+    dict_response_checker(response, {'count': 1})
+    assert linked_children(state, 'pseudoroot_1_parent_1') == {
+        'pseudoroot_1_child_1'
+    }
+    assert linked_children(state, 'pseudoroot_1_parent_0') == {
+        'pseudoroot_1_child_0'
+    }
+
+    response = post_json(
+        state.client, '/parents/pseudoroot_1_parent_2/children', data=ids
+    )
+    assert response.status_code == 404
+    raw_response_checker(response, NO_SUCH_PARENT_MESSAGE)
+
+
+@pytest.mark.parametrize('req,correct_data', [
+    (partial(post_json, data=[1, 2]), INVALID_LINKS_MESSAGE),
+    (
+        partial(post_json, data=[{'id': 'pseudoroot_1_child_0'}, {}]),
+        INVALID_LINKS_MESSAGE,
+    ),
+    (partial(post_json, data={'name': 'a'}), INVALID_LINKS_MESSAGE),
+    (partial(post_json, data='pseudoroot_1_child_0'), INVALID_LINKS_MESSAGE),
+    (
+        partial(
+            delete,
+            data=json.dumps({'ids': 'pseudoroot_1_child_0'}),
+            content_type='application/json',
+        ),
+        INVALID_IDS_MESSAGE,
+    ),
+])
+def test_invalid_links(req, correct_data):
+    state = client(
+        (
+            '/parents/<level_0_id>/children',
+            bulk_many_to_many_handler_maker,
+            ['POST', 'DELETE'],
+        ),
+        circular_full_data,
+    )
+    url = '/parents/pseudoroot_1_parent_1/children'
+    response = req(state.client, url=url)
+    assert response.status_code == 400
+    raw_response_checker(response, correct_data)
+    assert linked_children(state, 'pseudoroot_1_parent_1') == {
+        'pseudoroot_1_child_1'
+    }
+
+
+def l3_update_handler_maker(session):
+    return data_handler(
+        partial(
+            update_item,
+            session,
+            l3_query,
+            Level3.name,
+            validator=partial(validate_item, create_schema(Level3)(), session),
+        )
+    )
+
+
+@pytest.mark.parametrize('item_name,data,status_code,correct_names', [
+    (
+        'level3_0',
+        {'name': 'new_name'},
+        200,
+        {'new_name', 'root_1_level1_1_level2_1_level3_1'},
+    ),
+    (
+        'level3_2',
+        {'name': 'new_name'},
+        404,
+        {
+            'root_1_level1_1_level2_1_level3_0',
+            'root_1_level1_1_level2_1_level3_1',
+        },
+    ),
+    (
+        'level3_0',
+        {'name': 1},
+        400,
+        {
+            'root_1_level1_1_level2_1_level3_0',
+            'root_1_level1_1_level2_1_level3_1',
+        },
+    ),
+])
+def test_update_item(item_name, data, status_code, correct_names):
+    state = client(
+        (level3_item_rule, l3_update_handler_maker, ['PATCH']),
+        hierarchy_full_data,
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1', item_name)
+    )
+    response = patch(state.client, url, data)
+    assert response.status_code == status_code
+    if status_code == 400:
+        dict_response_checker(response, {'name': ['Not a valid string.']})
+    assert level3_names(state) == correct_names
+
+
+@pytest.mark.parametrize('handler_maker', [
+    l3_update_handler_maker, l3_item_patch_handler_maker,
+])
+@pytest.mark.parametrize('data,correct_data', [
+    (['new_name'], NOT_AN_OBJECT_MESSAGE),
+    ('new_name', NOT_AN_OBJECT_MESSAGE),
+    ({'nope': 1}, UNKNOWN_FIELDS_MESSAGE.format('nope')),
+    ({'name': 'new_name', 'nope': 1}, UNKNOWN_FIELDS_MESSAGE.format('nope')),
+])
+def test_invalid_item_bodies(handler_maker, data, correct_data):
+    state = client(
+        (level3_item_rule, handler_maker, ['PATCH']),
+        hierarchy_full_data,
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1', 'level3_0')
+    )
+    response = patch(state.client, url, data)
+    assert response.status_code == 400
+    raw_response_checker(response, correct_data)
+    assert level3_names(state) == {
+        'root_1_level1_1_level2_1_level3_0',
+        'root_1_level1_1_level2_1_level3_1',
+    }
+
+
+def test_update_item_within_parent():
+    state = client(
+        (
+            '/children/<level_0_id>/grandchildren/<level_1_id>',
+            lambda session: data_handler(partial(
+                update_item,
+                session,
+                partial(
+                    query,
+                    model_to_query=Grandchild,
+                    join_attrs=(Child,),
+                    attrs_to_filter=(Grandchild.name, Child.id),
+                ),
+                Grandchild.name,
+            )),
+            ['PATCH'],
+        ),
+        same_named_grandchildren,
+    )
+    response = patch(state.client, '/children/1/grandchildren/a',
+                     {'name': 'c'})
+    assert response.status_code == 200
+    assert grandchild_names(state) == {(1, 'c'), (1, 'b'), (2, 'a')}
+
+
+def test_key_order():
+    names = key_names(12)
+    assert names[0] == 'level_11_id' and names[-1] == 'level_0_id'
+    assert keys_from_kwargs(**{n: n for n in names}) == names
+
+
+@pytest.mark.parametrize('keys', [None, key_names(3)])
+def test_unknown_spec(keys):
+    state = client(
+        (
+            level3_collection_rule,
+            lambda session: get_handler(
+                partial(get_collection, session, l3_col_query,
+                        partial(serialize_collection,
+                                create_schema(Level3)())),
+                {'by_name': l3_by_name_spec},
+                keys,
+            ),
+            ['GET'],
+        ),
+        hierarchy_full_data,
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = get(state.client, url, query_string={
+        'spec': json.dumps({'name': 'no_such_spec', 'args': []})
+    })
+    assert response.status_code == 400
+    raw_response_checker(response, NO_SUCH_SPEC_MESSAGE)
+    response = get(state.client, url, query_string=search_dict(
+        'root_1_level1_1_level2_1_level3_1'
+    ))
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('query_string,correct_data', [
+    ({'spec': '{'}, INVALID_SPEC_MESSAGE),
+    ({'spec': '[]'}, INVALID_SPEC_MESSAGE),
+    ({'spec': json.dumps({'name': 'by_name'})}, INVALID_SPEC_MESSAGE),
+    ({'spec': json.dumps({'name': 'by_name', 'args': 1})},
+     INVALID_SPEC_MESSAGE),
+    ({'spec': json.dumps({'name': [], 'args': []})}, NO_SUCH_SPEC_MESSAGE),
+    ({'page': 'a', 'size': '1'}, INVALID_PAGE_MESSAGE),
+    ({'page': '1', 'size': '1.5'}, INVALID_PAGE_MESSAGE),
+    ({'page': '0', 'size': '1'}, INVALID_PAGE_MESSAGE),
+    ({'page': '1', 'size': '-1'}, INVALID_PAGE_MESSAGE),
+])
+def test_invalid_query_params(query_string, correct_data):
+    state = client(
+        (
+            level3_collection_rule,
+            lambda session: get_handler(
+                partial(get_collection, session, l3_col_query,
+                        partial(serialize_collection,
+                                create_schema(Level3)())),
+                {'by_name': l3_by_name_spec},
+            ),
+            ['GET'],
+        ),
+        hierarchy_full_data,
+    )
+    url = make_url(
+        collection_names=('roots', 'level1s', 'level2s', 'level3s'),
+        item_names=('root_1', 'level1_1', 'level2_1')
+    )
+    response = get(state.client, url, query_string=query_string)
+    assert response.status_code == 400
+    raw_response_checker(response, correct_data)
+
 # TODO test_patch
 
     # def test_patch(session):
@@ -1,7 +1,14 @@
-from rest.introspect import pk_attr_name, related_models
+from rest.handlers import create_schema
+from rest.introspect import (
+    dumped_relationships,
+    has_update_hooks,
+    pk_attr_name,
+    related_models,
+)
+from sqlalchemy import event
 from sqlalchemy.orm.base import MANYTOMANY, ONETOMANY
 from sqlalchemy.util import symbol
-from tests.fixtures import Child, Grandchild, Level1, Parent, Root
+from tests.fixtures import Child, Grandchild, Level1, Level3, Parent, Root
 
 
 def test_pk_name_for_model():
@@ -13,3 +20,27 @@ def test_related_models():
     assert {Level1: ('level1s', ONETOMANY)} == related_models(Root)
     assert {Child: ('children', MANYTOMANY)} == related_models(Parent)
     assert {Parent: ('parents', MANYTOMANY), Grandchild: ('grandchildren', ONETOMANY)} == related_models(Child)
+
+
+def test_dumped_relationships():
+    assert ('level1s',) == dumped_relationships(Root, create_schema(Root))
+    assert () == dumped_relationships(
+        Root,
+        create_schema(Root, {'exclude': ('level1s',)})()
+    )
+    assert ('grandchildren',) == dumped_relationships(
+        Child,
+        create_schema(Child, {'exclude': ('parents',)})()
+    )
+
+
+def test_has_update_hooks():
+    def listener(*args):
+        pass
+
+    assert not has_update_hooks(Level3)
+    for target, name in ((Level3, 'before_update'), (Level3.name, 'set')):
+        event.listen(target, name, listener)
+        assert has_update_hooks(Level3)
+        event.remove(target, name, listener)
+    assert not has_update_hooks(Level3)
@@ -1,7 +1,7 @@
 from functools import partial
 import pytest
 
-from rest.query import query
+from rest.query import prepared_query, query
 from tests.fixtures import (
     hierarchy_full_data,
     circular_full_data,
@@ -68,6 +68,28 @@ class Helper(object):
             if l3.name == 'root_0_level1_0_level2_0_level3_0'
         ]
     ),
+    (
+        Helper(session(), hierarchy_full_data),
+        partial(
+            prepared_query(
+                model_to_query=Level3,
+                join_attrs=(Level2, Level1, Root),
+                attrs_to_filter=(Level2.name, Level1.name, Root.name),
+            ),
+            keys=(
+                'root_0_level1_0_level2_0',
+                'root_0_level1_0',
+                'root_0',
+            )
+        ),
+        lambda roots: [
+            l3
+            for r in roots if r.name == 'root_0'
+            for l1 in r.level1s if l1.name == 'root_0_level1_0'
+            for l2 in l1.level2s if l2.name == 'root_0_level1_0_level2_0'
+            for l3 in l2.level3s
+        ]
+    ),
     (
         Helper(session(), circular_full_data),
         partial(
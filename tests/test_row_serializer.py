@@ -0,0 +1,41 @@
+import pytest
+from rest.handlers import (
+    create_schema,
+    serialize_collection,
+    serialize_item,
+)
+from rest.row_serializer import row_serializer
+from tests.fixtures import (
+    Child,
+    Level3,
+    Root,
+    hierarchy_full_data,
+    session,
+)
+
+
+@pytest.mark.parametrize('model,schema', [
+    (Level3, create_schema(Level3)()),
+    (Root, create_schema(Root, {'exclude': ('level1s',)})()),
+])
+def test_row_serializer(model, schema):
+    sess = session()
+    hierarchy_full_data(sess)
+    sess.commit()
+    collection_serializer = row_serializer(model, schema, many=True)
+    item_serializer = row_serializer(model, schema)
+    rows = sess.query(*collection_serializer.columns).all()
+    items = sess.query(model).all()
+    assert collection_serializer(rows) == serialize_collection(schema, items)
+    assert item_serializer(rows[0]) == serialize_item(schema, items[0])
+    assert collection_serializer(rows, only=('name',)) == \
+        serialize_collection(schema, items, only=('name',))
+
+
+@pytest.mark.parametrize('model,schema', [
+    (Root, create_schema(Root)()),
+    (Child, create_schema(Child, {'exclude': ('parents',)})()),
+])
+def test_row_serializer_with_relations(model, schema):
+    with pytest.raises(ValueError):
+        row_serializer(model, schema)
@@ -255,3 +255,38 @@ class NestedParam(BasicTestParam):
 def test_schema_transformation(mschema, param):
     jschema = to_jsonschema(mschema)
     assert jschema == param.correct_jsonschema
+
+
+class TwiceNestedSchema(Schema):
+    first = Nested(StringSchema)
+    second = Nested(StringSchema)
+
+
+class TreeSchema(Schema):
+    name = String()
+    parent = Nested('self')
+
+
+def test_definitions():
+    jschema = to_jsonschema(TwiceNestedSchema(), definitions=True)
+    ref = {'type': 'object', '$ref': '#/definitions/StringSchema'}
+    assert jschema['properties'] == {'first': ref, 'second': ref}
+    assert jschema['definitions'] == {
+        'StringSchema': StringParam().correct_jsonschema
+    }
+    assert 'definitions' not in to_jsonschema(StringSchema, definitions=True)
+
+
+def test_self_nested():
+    jschema = to_jsonschema(TreeSchema())
+    assert jschema['properties']['parent'] == {'type': 'object'}
+    jschema = to_jsonschema(TreeSchema(), definitions=True)
+    assert jschema['properties']['parent']['$ref'] == \
+        '#/definitions/TreeSchema'
+    assert jschema['definitions']['TreeSchema']['properties']['parent'] == \
+        jschema['properties']['parent']
+
+
+def test_cached_schemas_are_copies():
+    to_jsonschema(NestedSchema())['properties']['order_info']['type'] = 'x'
+    assert to_jsonschema(NestedSchema()) == NestedParam().correct_jsonschema
@@ -1,17 +1,29 @@
-from operator import eq
-
-import networkx as nx
-from networkx.algorithms.isomorphism.isomorph import is_isomorphic
+import pytest
 from pytest import fixture
 from rest.helpers import inits
-from rest.hierarchy_traverser import all_paths, create_graph
-from tests.fixtures import Parent, Root, cyclic_graph, hierarchy_graph
+from rest.hierarchy_traverser import (
+    Edge,
+    ModelGraph,
+    all_paths,
+    create_graph,
+    from_networkx,
+    networkx_decorator,
+    to_networkx,
+)
+from tests.fixtures import (
+    Child,
+    Grandchild,
+    Parent,
+    Root,
+    cyclic_graph,
+    hierarchy_graph,
+)
 from six.moves import map
 
 
 @fixture
 def graph():
-    g = nx.DiGraph()
+    g = ModelGraph()
     g.add_edge('0', '1.0')
     g.add_edge('1.0', '2.0')
     g.add_edge('1.0', '2.1')
@@ -39,15 +51,18 @@ def test_inits():
     assert inits(a) == correct_inits
 
 
-def test_create_hierarchy(cyclic_graph, hierarchy_graph):
-    g = create_graph(Root)
-    assert is_isomorphic(g, hierarchy_graph, node_match=eq, edge_match=eq)
-    g = create_graph(Parent)
-    assert is_isomorphic(g, cyclic_graph, node_match=eq, edge_match=eq)
+def edge_set(graph):
+    return set((u, v, graph[u][v]['rel_attr'], graph[u][v]['rel_type'])
+               for u, v in graph.edges())
 
 
-def graph_isom(graph1, graph2):
-    return is_isomorphic(graph1, graph2, node_match=eq, edge_match=eq)
+def test_create_hierarchy(cyclic_graph, hierarchy_graph):
+    for root, correct_graph in ((Root, hierarchy_graph),
+                                (Parent, cyclic_graph)):
+        g = create_graph(root)
+        assert set(g.nodes()) == set(correct_graph.nodes())
+        assert edge_set(g) == edge_set(correct_graph)
+        assert g == correct_graph
 
 
 def test_all_paths(graph):
@@ -77,3 +92,60 @@ def test_all_paths(graph):
         ('0', '1.0', '2.1', '2.0', '3.0'),
     )
     assert set(paths) == set(correct_paths)
+
+
+def test_all_paths_limits(graph_with_cycles):
+    paths = set(all_paths(graph_with_cycles, '0', max_depth=2))
+    assert paths == {('0',), ('0', '1.0'), ('0', '1.0', '2.0'),
+                     ('0', '1.0', '2.1')}
+
+    def without_cycles(parent, child, data):
+        return parent[0] < child[0]
+    paths = set(all_paths(graph_with_cycles, '0', edge_filter=without_cycles))
+    assert paths == set(all_paths(graph(), '0'))
+
+    with pytest.warns(UserWarning):
+        paths = list(all_paths(graph_with_cycles, '0', max_paths=3))
+    assert paths == [('0',), ('0', '1.0'), paths[2]]
+    assert len(list(all_paths(graph_with_cycles, '0', max_paths=10))) == 10
+
+
+def test_model_graph(graph_with_cycles):
+    g = graph_with_cycles
+    assert g.successors('1.0') == ['2.0', '2.1']
+    assert g.predecessors('2.0') == ['1.0', '2.1']
+    assert g.has_edge('2.0', '2.1') and not g.has_edge('0', '2.0')
+    assert (g.out_degree('2.1'), g.in_degree('2.1')) == (2, 2)
+    g.add_edge('0', '4', rel_attr='fours')
+    assert g['0']['4'] == Edge('fours')
+    assert g['0']['4']['rel_attr'] == 'fours'
+    assert g['0']['4'].get('rel_type') is None
+    copy = g.copy()
+    assert copy == g
+    g.remove_node('2.1')
+    assert not g.has_edge('1.0', '2.1') and '2.1' not in g.predecessors('2.0')
+    assert copy != g
+
+
+def test_model_graph_equality(graph):
+    reordered = ModelGraph()
+    for u, v in reversed(graph.edges()):
+        reordered.add_edge(u, v)
+    assert reordered.nodes() != graph.nodes()
+    assert reordered == graph
+    reordered['0']['1.0']['rel_attr'] = 'ones'
+    assert reordered != graph
+
+
+def test_networkx_adapter(cyclic_graph):
+    pytest.importorskip('networkx')
+    nx_graph = to_networkx(cyclic_graph)
+    assert nx_graph[Parent][Child]['rel_attr'] == 'children'
+    assert from_networkx(nx_graph) == cyclic_graph
+
+    def without_grandchildren(nx_graph):
+        nx_graph.remove_node(Grandchild)
+        return nx_graph
+    g = networkx_decorator(without_grandchildren)(cyclic_graph)
+    assert g.nodes() == [Parent, Child]
+    assert g[Child][Parent] == cyclic_graph[Child][Parent]